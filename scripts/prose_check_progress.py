@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
-import os
-from proselib import ProseProjectTransformer
+from proselib import format_status
 
-prose = ProseProjectTransformer.load(path_to_transformer=os.path.join("prose_workspace", [x for x in os.listdir("prose_workspace/") if x.endswith("ProseProjectTransformer.pckl")][0]))
-prose.report()
+# the status is kept up to date by the search itself, so nothing needs to be loaded or rescanned here
+try:
+    print(format_status())
+except FileNotFoundError:
+    print("No search status found; run from the experiment directory of a search that has started.")
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+'''
+Compiler wrapper that reuses the outputs of earlier compilations of identical
+translation units; e.g., build with FC="prose_compiler_cache.py gfortran".
+The cache is only used while PROSE_COMPILER_CACHE is set, which PROSE does for
+its builds whenever the setup file has a [cache] section.
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, "src", "python")))
+
+from compilercache import main
+
+sys.exit(main(sys.argv[1:]))
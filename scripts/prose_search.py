@@ -1,8 +1,7 @@
 #!/usr/bin/env python3
 
 import argparse
-import os
-from proselib import PrecimoniousSearch, ProseProjectTransformer
+from proselib import ProseProjectTransformer, get_search_algorithm_class
 
 # Initialize and execute CLI argument parser
 parser = argparse.ArgumentParser(description=__doc__)
@@ -11,23 +10,23 @@ parser.add_argument('-s', metavar='setup_file_path', type=str, required=True,
                         ' and evaluate the codebase to be tuned.')
 args = parser.parse_args()
 
-# if there are saved transformers, load them
+# if there is a saved experiment, load it
 try:
-    saved_transformer = [x for x in os.listdir("prose_workspace/") if x.endswith("ProseProjectTransformer.pckl")][0]
-    prose = ProseProjectTransformer.load(path_to_transformer=os.path.join("prose_workspace", saved_transformer), resume=True)
+    prose = ProseProjectTransformer.load(resume=True)
+    search_algorithm_class = get_search_algorithm_class(prose.SETUP['search']['algorithm'])
 
     # if there is a saved search algorithm object, load it -- we are resuming an interrupted search
-    if os.path.exists("prose_workspace/__PrecimoniousSearch.pckl"):
-        search_algorithm = PrecimoniousSearch.load()
+    if search_algorithm_class.has_checkpoint():
+        search_algorithm = search_algorithm_class.load()
         
     # otherwise, we are assuming that this script is being called after prose_preliminary.py
     else:
-        search_algorithm = PrecimoniousSearch(prose.generate_search_space(args.s))
+        search_algorithm = search_algorithm_class(prose.generate_search_space(args.s))
 
 # otherwise, run the whole pipeline
-except (FileNotFoundError, IndexError):
+except FileNotFoundError:
     prose = ProseProjectTransformer(args.s)
     prose.preliminary_analysis()
-    search_algorithm = PrecimoniousSearch(prose.generate_search_space(args.s))
+    search_algorithm = get_search_algorithm_class(prose.SETUP['search']['algorithm'])(prose.generate_search_space(args.s))
 
 prose.search(search_algorithm)
\ No newline at end of file
@@ -23,6 +23,9 @@ sys.path.insert(
 from transformers import ProseProjectTransformer
 from precimonious import PrecimoniousSearch
 from bruteforce import BruteForceSearch
+from search import SearchAlgorithm, get_search_algorithm_class
 from profiling import preprocess_project
+from resultslog import read_records, get_variants, get_batches
+from status import format_status
 
 del sys.path[0], sys, os
\ No newline at end of file
@@ -1,17 +1,29 @@
 #!/usr/bin/env python3
 import os
+from proselib import get_variants, get_batches
 
-configDirs = sorted([x for x in os.listdir(os.getcwd()) if x.isnumeric() and len(x) == 3])
-configDirs = configDirs + sorted([x for x in os.listdir(os.getcwd()) if x.isnumeric() and len(x) == 4])
+# run from prose_logs; outcomes and batch boundaries come from the results log, precisions from the config files
+batches = {record["last_configuration_number"] : record for record in get_batches("results.jsonl")}
 
-for dir in configDirs:
+for configurationNumber, record in get_variants("results.jsonl").items():
 
-    flags = [x for x in os.listdir(dir) if x.startswith("FLAG_")]
-    cost = [x[len("COST_"):] for x in os.listdir(dir) if x.startswith("COST_")]
-    configFile = [x for x in os.listdir(dir) if "config" in x][0]
+    dir = "{:0>4}".format(configurationNumber)
+    cost = [str(record["cost"])] if record["cost"] is not None else []
+    configFile = "config_{}".format(record["label"])
+    if not os.path.exists(os.path.join(dir, configFile)):
+        continue
 
-    if configFile == "config":
-        break
+    flags = []
+    if configurationNumber in batches:
+        batch = batches[configurationNumber]
+        flags.append("----------------------------BATCH_END")
+        if batch["improvement"] is not None:
+            flags.append("IMPROVEMENT_DISCOVERED_IN_CONFIG_{:0>4}".format(batch["improvement"]))
+        else:
+            flags.append("NO_IMPROVEMENT")
+        if batch["reset_delta"]:
+            flags.append("RESET_DELTA")
+        flags.append("DELTA_{}_DIV_{}".format(batch["delta_size"], batch["delta_divisions"]))
 
     # effRatioFile = [x for x in os.listdir(dir) if x.startswith("eff_ratio")][0]
     # runoutFile = [x for x in os.listdir(dir) if x.startswith("000_runout")][0]
@@ -52,5 +64,5 @@ for dir in configDirs:
     # print(runoutText)
     if flags:
         for flag in flags:
-            print("\t {}".format(flag[len("FLAG_"):]))
+            print("\t {}".format(flag))
     print()
\ No newline at end of file
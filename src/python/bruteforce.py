@@ -1,20 +1,36 @@
-from itertools import product
+from search import SearchAlgorithm
 
-class BruteForceSearch:
+class BruteForceSearch(SearchAlgorithm):
+
+    # every configuration is tested regardless of the results of the others
+    proposals_depend_on_feedback = False
 
     def __init__(self, search_space):
-        self.completed_config_counter = 0
-        self.config_iterator = product(*[list(reversed(sorted(kinds))) for kinds in search_space.values()])
+        super().__init__(search_space)
         self.var_names = list(search_space.keys())
+        self.kinds = [list(reversed(sorted(kinds))) for kinds in search_space.values()]
+
+        # configurations are enumerated in the order of itertools.product, by index so that the search can be checkpointed
+        self.next_config_index = 0
+        self.num_configs = 1
+        for kinds in self.kinds:
+            self.num_configs *= len(kinds)
 
-    def feedback(self, configuration_dict):        
-        self.completed_config_counter += 1
+    def get_num_remaining(self):
+
+        # configurations not proposed yet and those proposed but not reported yet
+        return self.num_configs - self.next_config_index + len(self.proposed_configurations) - len(self.finished_configurations)
 
     def get_next(self):
 
-        next_config = next(self.config_iterator, None)
+        if self.next_config_index >= self.num_configs:
+            return None
+
+        next_config = []
+        remainder = self.next_config_index
+        for kinds in reversed(self.kinds):
+            next_config.insert(0, kinds[remainder % len(kinds)])
+            remainder //= len(kinds)
+        self.next_config_index += 1
 
-        if next_config:
-            return { 'config' : {self.var_names[i] : next_config[i] for i in range(len(next_config))} }
-        else:
-            return None
\ No newline at end of file
+        return { 'config' : {self.var_names[i] : next_config[i] for i in range(len(next_config))} }
\ No newline at end of file
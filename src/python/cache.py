@@ -0,0 +1,181 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+# setup entries that only steer the search and have no bearing on the outcome of testing a single configuration
+SEARCH_ONLY_SETUP_ENTRIES = {
+    'eval' : ['cost_threshold'],
+    'run' : ['timeout', 'execution_filtering', 'baseline_samples', 'timeout_multiplier', 'timeout_quantile', 'stall_timeout'],
+    'machine' : ['index_digests', 'parse_workers'],
+}
+SEARCH_ONLY_SETUP_SECTIONS = ['cache', 'parallel', 'Derecho', 'sandbox', 'search']
+
+# setup entries holding "|"-separated paths that SetupParser made relative to the experiment directory
+EXPERIMENT_RELATIVE_SETUP_ENTRIES = {
+    'target' : ['src_files'],
+    'build' : ['working_dir'],
+    'run' : ['working_dir'],
+    'eval' : ['working_dir'],
+}
+
+
+def digest_setup(SETUP, sections=None):
+
+    # canonical digest of the parsed setup file, optionally restricted to the given sections; paths relative to the
+    # experiment directory are taken relative to the project root instead, so that experiment directories share results
+    digest = hashlib.sha256()
+    for section in sorted(SETUP._data.sections()):
+        if section in SEARCH_ONLY_SETUP_SECTIONS or (sections and section not in sections):
+            continue
+        for key, value in sorted(SETUP._data[section].items()):
+            if key in SEARCH_ONLY_SETUP_ENTRIES.get(section, []):
+                continue
+            if key in EXPERIMENT_RELATIVE_SETUP_ENTRIES.get(section, []):
+                value = "|".join([os.path.relpath(os.path.join(SETUP.working_dir, path), SETUP['machine']['project_root']) for path in value.split("|") if path])
+            digest.update("[{}]{}={}\n".format(section, key, value).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def digest_files(paths):
+
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def digest_configuration(configuration):
+    return hashlib.sha256(json.dumps(configuration, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def digest_context(transformer, sections=None):
+
+    # everything besides the configuration that determines the outcome of
+    # transforming and testing, i.e., the plugin, the setup file, and the original source code
+    workspace_path = os.path.join(transformer.PROSE_EXPERIMENT_DIR, "prose_workspace")
+    source_paths = sorted([os.path.join(workspace_path, "original_files", x) for x in os.listdir(os.path.join(workspace_path, "original_files"))])
+    source_paths += sorted([os.path.join(workspace_path, "rmod_files", x) for x in os.listdir(os.path.join(workspace_path, "rmod_files"))])
+    source_paths += [os.path.join(workspace_path, x) for x in ["ignore_scopes.txt", "constant_list.txt"] if os.path.exists(os.path.join(workspace_path, x))]
+
+    return hashlib.sha256("{}{}{}".format(
+        digest_files([os.path.join(transformer.PROSE_PLUGIN_PATH, "ProsePlugin.so")]),
+        digest_setup(transformer.SETUP, sections),
+        digest_files(source_paths),
+    ).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    '''
+    Persistent, content-addressed cache of configuration test results
+    '''
+
+    def __init__(self, cache_path, context_digest):
+
+        self.cache_path = os.path.join(cache_path, "results")
+        self.context_digest = context_digest
+        os.makedirs(self.cache_path, exist_ok=True)
+
+
+    @staticmethod
+    def from_transformer(transformer):
+        return ResultCache(transformer.SETUP['cache']['path'], digest_context(transformer))
+
+
+    def _entry_path(self, configuration):
+        key = hashlib.sha256((self.context_digest + digest_configuration(configuration)).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_path, key[:2], key)
+
+
+    def get(self, configuration, configuration_dir):
+
+        # on a hit, restore the cached evaluation artifacts into the configuration directory and return the result
+        entry_path = self._entry_path(configuration)
+        try:
+            with open(os.path.join(entry_path, "result.json"), "r") as f:
+                result = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        artifacts_path = os.path.join(entry_path, "artifacts")
+        for name in os.listdir(artifacts_path):
+            if os.path.isdir(os.path.join(artifacts_path, name)):
+                shutil.copytree(os.path.join(artifacts_path, name), os.path.join(configuration_dir, name), symlinks=True, dirs_exist_ok=True)
+            else:
+                shutil.copy2(os.path.join(artifacts_path, name), os.path.join(configuration_dir, name))
+
+        return result
+
+
+    def put(self, configuration, configuration_dir, result):
+
+        entry_path = self._entry_path(configuration)
+        if os.path.exists(entry_path):
+            return
+
+        # stage the entry next to its final location and move it into place so that
+        # concurrent searches sharing this cache never observe a partially written entry
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        staging_path = tempfile.mkdtemp(dir=os.path.dirname(entry_path))
+        shutil.copytree(
+            configuration_dir,
+            os.path.join(staging_path, "artifacts"),
+            ignore=shutil.ignore_patterns("config", "config_*"),
+            symlinks=True,
+        )
+        with open(os.path.join(staging_path, "result.json"), "w") as f:
+            json.dump(result, f)
+
+        try:
+            os.rename(staging_path, entry_path)
+        except OSError:
+            shutil.rmtree(staging_path, ignore_errors=True)
+
+
+class SourceCache:
+    '''
+    Persistent cache of transformed source files keyed by the slice of the configuration that affects each file
+    '''
+
+    def __init__(self, cache_path, context_digest):
+
+        self.cache_path = os.path.join(cache_path, "sources")
+        self.context_digest = context_digest
+        os.makedirs(self.cache_path, exist_ok=True)
+
+
+    @staticmethod
+    def from_transformer(transformer):
+
+        # only the target section of the setup file has a bearing on the output of the plugin
+        return SourceCache(transformer.SETUP['cache']['path'], digest_context(transformer, sections=['target']))
+
+
+    def _entry_path(self, file_name, restricted_configuration):
+        key = hashlib.sha256((self.context_digest + file_name + digest_configuration(restricted_configuration)).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_path, key[:2], key)
+
+
+    def contains(self, file_name, restricted_configuration):
+        return os.path.exists(self._entry_path(file_name, restricted_configuration))
+
+
+    def get(self, file_name, restricted_configuration, destination_path):
+        shutil.copyfile(self._entry_path(file_name, restricted_configuration), destination_path)
+
+
+    def put(self, file_name, restricted_configuration, source_path):
+
+        entry_path = self._entry_path(file_name, restricted_configuration)
+        if os.path.exists(entry_path):
+            return
+
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        fd, staging_path = tempfile.mkstemp(dir=os.path.dirname(entry_path))
+        os.close(fd)
+        shutil.copyfile(source_path, staging_path)
+        os.replace(staging_path, entry_path)
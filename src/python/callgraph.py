@@ -0,0 +1,83 @@
+def get_strongly_connected_components(successors):
+
+    # iterative version of Tarjan's algorithm over vertices 0..n-1, where successors[v] lists the successors of v;
+    # components are returned in reverse topological order, i.e., every component comes before those that reach it
+    num_vertices = len(successors)
+    indices = [-1] * num_vertices
+    lowlinks = [0] * num_vertices
+    on_stack = [False] * num_vertices
+    stack = []
+    components = []
+    counter = 0
+
+    for root in range(num_vertices):
+        if indices[root] != -1:
+            continue
+
+        indices[root] = lowlinks[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, iter(successors[root]))]
+
+        while len(work) != 0:
+            vertex, successor_iter = work[-1]
+
+            descended = False
+            for successor in successor_iter:
+                if indices[successor] == -1:
+                    indices[successor] = lowlinks[successor] = counter
+                    counter += 1
+                    stack.append(successor)
+                    on_stack[successor] = True
+                    work.append((successor, iter(successors[successor])))
+                    descended = True
+                    break
+                elif on_stack[successor]:
+                    lowlinks[vertex] = min(lowlinks[vertex], indices[successor])
+            if descended:
+                continue
+
+            work.pop()
+            if len(work) != 0:
+                parent = work[-1][0]
+                lowlinks[parent] = min(lowlinks[parent], lowlinks[vertex])
+
+            if lowlinks[vertex] == indices[vertex]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == vertex:
+                        break
+                components.append(component)
+
+    return components
+
+
+class CallGraph:
+    '''
+    Call graph of the target program (G_proc) as adjacency sets, indexed by scope name
+    '''
+
+    def __init__(self, scope_names, callers, callees):
+
+        # one entry per call in callers/callees, given as indices into scope_names
+        self.scope_names = list(scope_names)
+        self.scope_indices = {scope_name : i for i, scope_name in enumerate(self.scope_names)}
+        self.callees = [set() for _ in self.scope_names]
+        for caller, callee in zip(callers, callees):
+            self.callees[int(caller)].add(int(callee))
+
+
+    def __contains__(self, scope_name):
+        return scope_name in self.scope_indices
+
+
+    def __len__(self):
+        return len(self.scope_names)
+
+
+    def calls(self, caller_name, callee_name):
+        return self.scope_indices[callee_name] in self.callees[self.scope_indices[caller_name]]
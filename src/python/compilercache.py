@@ -0,0 +1,228 @@
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from rebuild import MODULE_PATTERN, USE_PATTERN, digest_file, make_staging_file, write_if_changed
+
+INCLUDE_PATTERN = re.compile(r"^\s*include\s+['\"]([^'\"]+)['\"]", re.IGNORECASE)
+SOURCE_EXTENSIONS = (".f", ".for", ".ftn", ".f90", ".f95", ".f03", ".f08", ".c", ".cc", ".cpp", ".cxx")
+
+# flags whose value may be given as a separate argument
+VALUE_FLAGS = ["-o", "-I", "-J", "-module", "-D", "-U", "-include", "-isystem"]
+
+
+class CompileCommand:
+    '''
+    The parts of a compiler invocation that matter for caching its outputs
+    '''
+
+    def __init__(self, args):
+
+        self.compiler = args[0]
+        self.args = args[1:]
+        self.is_compile = "-c" in self.args
+        self.src_paths = []
+        self.object_path = None
+        self.module_dir = None
+        self.include_dirs = []
+
+        # the arguments without the name of the object file, which has no bearing on its content
+        self.key_args = []
+
+        i = 0
+        while i < len(self.args):
+            arg = self.args[i]
+            flag, value = None, None
+            for value_flag in VALUE_FLAGS:
+                if arg == value_flag and i + 1 < len(self.args):
+                    flag, value = value_flag, self.args[i + 1]
+                    i += 1
+                    break
+                elif arg.startswith(value_flag) and value_flag in ["-I", "-J"]:
+                    flag, value = value_flag, arg[len(value_flag):]
+                    break
+
+            if flag == "-o":
+                self.object_path = value
+            else:
+                if flag == "-I":
+                    self.include_dirs.append(value)
+                elif flag in ["-J", "-module"]:
+                    self.module_dir = value
+                elif flag is None and not arg.startswith("-") and arg.lower().endswith(SOURCE_EXTENSIONS):
+                    self.src_paths.append(arg)
+                self.key_args += [arg] if value is None or arg != flag else [arg, value]
+            i += 1
+
+        if self.object_path is None and len(self.src_paths) == 1:
+            self.object_path = os.path.splitext(os.path.basename(self.src_paths[0]))[0] + ".o"
+        if self.module_dir is None:
+            self.module_dir = "."
+
+
+    def is_cacheable(self):
+        return self.is_compile and len(self.src_paths) == 1
+
+
+    def preprocess(self):
+
+        # the translation unit as seen by the compiler, i.e., with all includes and macros expanded;
+        # gfortran only preprocesses files with upper case extensions unless told otherwise
+        for preprocess_flags in [["-E"], ["-E", "-cpp"]]:
+            result = subprocess.run(
+                [self.compiler] + preprocess_flags + [arg for arg in self.key_args if arg != "-c"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            if result.returncode == 0:
+                return result.stdout.decode("utf-8", errors="ignore")
+        return None
+
+
+class CompilerCache:
+    '''
+    Cache of compiler outputs keyed by the preprocessed translation unit, the compiler and its flags
+    '''
+
+    def __init__(self, cache_path, base_dir=None):
+
+        # paths under base_dir are made relative before hashing so that identical
+        # translation units compiled in different build trees share their cache entries
+        self.cache_path = cache_path
+        self.base_dir = os.path.realpath(base_dir) if base_dir else None
+        os.makedirs(self.cache_path, exist_ok=True)
+
+
+    def _relativize(self, text):
+        if self.base_dir:
+            return text.replace(self.base_dir + os.sep, "").replace(self.base_dir, ".")
+        return text
+
+
+    def _get_key(self, command, translation_unit):
+
+        digest = hashlib.sha256()
+
+        compiler_path = os.path.realpath(shutil.which(command.compiler) or command.compiler)
+        compiler_stat = os.stat(compiler_path)
+        digest.update("{}:{}:{}\n".format(compiler_path, compiler_stat.st_size, compiler_stat.st_mtime_ns).encode("utf-8"))
+        digest.update(self._relativize("\0".join(command.key_args)).encode("utf-8"))
+        digest.update(self._relativize(translation_unit).encode("utf-8"))
+
+        # fortran include lines are left to the compiler rather than the preprocessor
+        include_dirs = [os.path.dirname(command.src_paths[0]) or "."] + command.include_dirs
+        for line in translation_unit.splitlines():
+            match = INCLUDE_PATTERN.match(line)
+            if match:
+                for include_dir in include_dirs:
+                    include_path = os.path.join(include_dir, match.group(1))
+                    if os.path.exists(include_path):
+                        digest.update(digest_file(include_path).encode("utf-8"))
+                        break
+
+        # the interfaces of the modules a fortran translation unit uses are part of its input
+        module_dirs = [command.module_dir, "."] + command.include_dirs
+        for module_name in sorted(self._get_module_names(translation_unit, USE_PATTERN)):
+            digest.update(module_name.encode("utf-8"))
+            for module_dir in module_dirs:
+                module_path = os.path.join(module_dir, module_name + ".mod")
+                if os.path.exists(module_path):
+                    digest.update(digest_file(module_path).encode("utf-8"))
+                    break
+
+        return digest.hexdigest()
+
+
+    @staticmethod
+    def _get_module_names(translation_unit, pattern):
+
+        module_names = set()
+        for line in translation_unit.splitlines():
+            match = pattern.match(line)
+            if match and match.group(1).lower() != "procedure":
+                module_names.add(match.group(1).lower())
+        return module_names
+
+
+    def compile(self, args):
+
+        command = CompileCommand(args)
+        if not command.is_cacheable():
+            return subprocess.run(args).returncode
+
+        translation_unit = command.preprocess()
+        if translation_unit is None:
+            return subprocess.run(args).returncode
+
+        key = self._get_key(command, translation_unit)
+        entry_path = os.path.join(self.cache_path, key[:2], key)
+        module_names = self._get_module_names(translation_unit, MODULE_PATTERN)
+
+        if os.path.exists(os.path.join(entry_path, "manifest.json")):
+            self._install(os.path.join(entry_path, "object"), command.object_path)
+            for module_name in module_names:
+                write_if_changed(os.path.join(entry_path, module_name + ".mod"), os.path.join(command.module_dir, module_name + ".mod"))
+            return 0
+
+        # compile into a temporary object file that then replaces the actual one, which
+        # never rewrites an object file in place that may be hard linked into other build trees
+        staging_object_path = make_staging_file(command.object_path)
+        try:
+            returncode = subprocess.run([command.compiler] + command.key_args + ["-o", staging_object_path]).returncode
+            if returncode != 0:
+                return returncode
+            self._store(entry_path, staging_object_path, command.module_dir, module_names)
+            os.replace(staging_object_path, command.object_path)
+        finally:
+            if os.path.exists(staging_object_path):
+                os.remove(staging_object_path)
+
+        return 0
+
+
+    @staticmethod
+    def _install(src_path, dst_path):
+
+        staging_path = make_staging_file(dst_path)
+        shutil.copyfile(src_path, staging_path)
+        os.replace(staging_path, dst_path)
+
+
+    @staticmethod
+    def _store(entry_path, object_path, module_dir, module_names):
+
+        module_paths = [os.path.join(module_dir, module_name + ".mod") for module_name in module_names]
+        if not all([os.path.exists(module_path) for module_path in module_paths]):
+            return
+
+        # stage the entry next to its final location so that concurrent builds never observe a partial entry
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        staging_path = tempfile.mkdtemp(dir=os.path.dirname(entry_path))
+        shutil.copyfile(object_path, os.path.join(staging_path, "object"))
+        for module_name, module_path in zip(module_names, module_paths):
+            shutil.copyfile(module_path, os.path.join(staging_path, module_name + ".mod"))
+        with open(os.path.join(staging_path, "manifest.json"), "w") as f:
+            json.dump({"modules" : sorted(module_names)}, f)
+
+        try:
+            os.rename(staging_path, entry_path)
+        except OSError:
+            shutil.rmtree(staging_path, ignore_errors=True)
+
+
+def main(args):
+
+    # without a cache to use, this is a plain compiler invocation
+    if "PROSE_COMPILER_CACHE" not in os.environ:
+        return subprocess.run(args).returncode
+
+    compiler_cache = CompilerCache(os.environ["PROSE_COMPILER_CACHE"], os.environ.get("PROSE_COMPILER_CACHE_BASEDIR"))
+    return compiler_cache.compile(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
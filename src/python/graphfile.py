@@ -0,0 +1,57 @@
+import os
+import numpy as np
+
+# records of the binary edge lists written by the plugin next to each .dot file
+EDGE_DTYPE = np.dtype([("source", "<i8"), ("target", "<i8"), ("weight", "<f8")])
+
+
+def load_graph(dot_path):
+
+    # returns the vertex names, in vertexD order, and the sources, targets and weights of the edges of a graph
+    # written by the plugin; the binary edge list is preferred over the .dot file unless it is missing or stale
+    prefix = os.path.splitext(dot_path)[0]
+    names_path = prefix + ".names"
+    edges_path = prefix + ".edges"
+    if os.path.exists(names_path) and os.path.exists(edges_path) and \
+            (not os.path.exists(dot_path) or os.path.getmtime(edges_path) >= os.path.getmtime(dot_path)):
+        with open(names_path, "r") as f:
+            names = f.read().splitlines()
+        edges = np.fromfile(edges_path, dtype=EDGE_DTYPE)
+        return names, edges["source"].astype(np.int64), edges["target"].astype(np.int64), edges["weight"].astype(np.float64)
+
+    return parse_dot(dot_path)
+
+
+def parse_dot(dot_path):
+
+    # .dot files of directed graphs have unweighted edges, e.g., G_proc, whose edges are labeled with call names
+    with open(dot_path, "r") as f:
+        lines = f.readlines()
+
+    # load all vertices, already in vertexD order
+    names = []
+    for line in lines:
+        if "{" in line or "}" in line:
+            continue    # skip first and last line of .dot file
+        elif line.find("--") == -1 and line.find("->") == -1:
+            try:
+                name = line.split('"')[1]
+            except IndexError as e:
+                name = line.split('=')[1].split("]")[0]
+            names.append(name)
+
+    # load all edges
+    sources = []
+    targets = []
+    weights = []
+    for line in lines:
+        if line.find("--") != -1:
+            sources.append(int(line.split('--')[0].strip()))
+            targets.append(int(line.split('[')[0].split('--')[1].strip()))
+            weights.append(float(line.split("=")[1].split("]")[0].strip().replace('"','')))
+        elif line.find("->") != -1:
+            sources.append(int(line.split('-')[0].strip()))
+            targets.append(int(line.split('[')[0].split('>')[1].strip()))
+            weights.append(1.0)
+
+    return names, np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64), np.array(weights, dtype=np.float64)
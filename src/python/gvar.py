@@ -1,98 +1,233 @@
 import numpy as np
-import networkx as nx
+from operator import itemgetter
+from graphfile import load_graph
 
 DEFAULT_KIND = 8
 
+# upper bound on the number of (configuration, edge) pairs scored at once
+CHUNK_SIZE = 1 << 22
+
+# configurations differing from the base configuration of an IncrementalCost in at most 1/INCREMENTAL_SHARE of their variables are scored against it
+INCREMENTAL_SHARE = 16
+
 class VariableInteractionGraph:
+    '''
+    Variable interaction graph of the target program, kept as arrays of edges, and the cost model over it
+    '''
 
     def __init__(self, G_var_path, sourceTransformers):
-        with open(G_var_path, "r") as f:
-            lines = f.readlines()
-
-            # load all vertices, already in vertexD order
-            self.var_names = []
-            for line in lines:
-                if "{" in line or "}" in line:
-                    continue    # skip first and last line of .dot file
-                elif line.find("--") == -1:
-                    try:
-                        var_name = line.split('"')[1]
-                    except IndexError as e:
-                        var_name = line.split('=')[1].split("]")[0]
-
-                    assert( var_name == var_name.lower() )
-                    self.var_names.append(var_name)
-
-            matrix = np.zeros((len(self.var_names), len(self.var_names)))
-
-            # load all edges
-            for line in lines:
-                if line.find("--") != -1:
-                    source_vertexD = int(line.split('--')[0].strip())
-                    target_vertexD = int(line.split('[')[0].split('--')[1].strip())
-                    weight = float(line.split("=")[1].split("]")[0].strip().replace('"',''))
-                    matrix[source_vertexD][target_vertexD] += weight
-                    matrix[target_vertexD][source_vertexD] += weight
-
-        self.sourceTransformers = sourceTransformers
-
-        # construct graph
-        try:
-            self.G = nx.from_numpy_matrix(matrix)
-        except AttributeError:
-            self.G = nx.from_numpy_array(matrix)
-            
-        nx.relabel_nodes(self.G, {i : name for i, name in enumerate(self.var_names)}, copy=False)
-        nx.set_node_attributes(self.G, {name : DEFAULT_KIND for name in self.var_names}, name="kind")
-        nx.set_node_attributes(self.G, {name : name[:name.rfind("::")] for name in self.var_names}, name="scope")
-
-        # get map of all of the original edge weights for resetting graph
-        self.original_edge_weights = nx.get_edge_attributes(self.G, "weight")
-        
+
+        # load all vertices, already in vertexD order, and all edges
+        self.var_names, sources, targets, weights = load_graph(G_var_path)
+        for var_name in self.var_names:
+            assert( var_name == var_name.lower() )
+
+        self.var_indices = {name : i for i, name in enumerate(self.var_names)}
+        self._build_edges(sources, targets, weights)
+
+        # edges with negative weights are interprocedural; their cost scales with the smaller dimension of their endpoints
+        dims = np.array([self._get_dim(sourceTransformers, name) for name in self.var_names], dtype=np.float64)
+        self.edge_is_inter = self.edge_weights < 0
+        self.edge_dims = np.minimum(dims[self.edge_sources], dims[self.edge_targets])
+
         # member variables to be set once search starts
-        # self.subgraph_nodes = None
         self.original_cost = None
 
 
-    def get_cost_ratio(self, configuration_obj):
+    def _build_edges(self, sources, targets, weights):
 
-        cost, _ = self.get_cost(configuration_obj["config"])
-        return self.original_cost / cost
+        # edges given several times, in either direction, add up the way they would in a symmetric
+        # adjacency matrix: self loops count twice, and pairs whose weights cancel out are no edges at all
+        num_vars = len(self.var_names)
+        lows = np.minimum(sources, targets)
+        highs = np.maximum(sources, targets)
+        weights = np.where(lows == highs, 2 * weights, weights)
+        keys, inverse = np.unique(lows * num_vars + highs, return_inverse=True)
+        summed_weights = np.zeros(len(keys))
+        np.add.at(summed_weights, inverse.reshape(-1), weights)
 
+        keep = summed_weights != 0
+        self.edge_sources = (keys // num_vars)[keep]
+        self.edge_targets = (keys % num_vars)[keep]
+        self.edge_weights = summed_weights[keep]
 
-    def get_cost(self, configuration, custom={}):
-        
-        # update note attributes with the new kinds
-        nx.set_node_attributes(self.G, configuration, name="kind")
-            
-        target_nodes = list(configuration.keys())
-        subgraph_nodes = set(target_nodes)
-        for node in target_nodes:
-            subgraph_nodes = subgraph_nodes.union(set(self.G.neighbors(node)))
+        # edges incident to each variable, in CSR form; self loops are listed once
+        edge_ids = np.arange(len(self.edge_weights))
+        not_loop = self.edge_sources != self.edge_targets
+        endpoints = np.concatenate([self.edge_sources, self.edge_targets[not_loop]])
+        incident_edges = np.concatenate([edge_ids, edge_ids[not_loop]])
+        order = np.lexsort((incident_edges, endpoints))
+        self.incident_edges = incident_edges[order]
+        self.incident_indptr = np.zeros(num_vars + 1, dtype=np.int64)
+        np.cumsum(np.bincount(endpoints, minlength=num_vars), out=self.incident_indptr[1:])
+
+
+    @staticmethod
+    def _get_dim(sourceTransformers, var_name):
+
+        # only interprocedural edges that change precision need the dimension of their endpoints
+        try:
+            return sourceTransformers[var_name[:var_name.rfind("::")]].variable_profile[var_name]["dim"]
+        except KeyError:
+            return np.nan
+
+
+    def _get_incident_edges(self, var_indices):
+
+        starts = self.incident_indptr[var_indices]
+        counts = self.incident_indptr[var_indices + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return self.incident_edges[offsets]
+
+
+    def _get_subgraph_edges(self, target_indices):
 
-        # calculate and update the edge weights that result
-        deltas = self.update_edge_weights(subgraph_nodes, custom)
+        # the edges among the targeted variables and their neighbors
+        incident_edges = self._get_incident_edges(target_indices)
+        in_subgraph = np.zeros(len(self.var_names), dtype=bool)
+        in_subgraph[target_indices] = True
+        in_subgraph[self.edge_sources[incident_edges]] = True
+        in_subgraph[self.edge_targets[incident_edges]] = True
+        return np.flatnonzero(in_subgraph[self.edge_sources] & in_subgraph[self.edge_targets])
 
-        # calculate sum of new edge weights
-        cost = self.get_edge_weight_sum(subgraph_nodes)
 
-        # reset
-        self.reset_graph()
+    def get_neighbors(self, var_name):
+        if var_name not in self.var_indices:
+            return []
+        var_index = self.var_indices[var_name]
+        incident_edges = self._get_incident_edges(np.array([var_index]))
+        neighbors = np.where(self.edge_sources[incident_edges] == var_index, self.edge_targets[incident_edges], self.edge_sources[incident_edges])
+        return [self.var_names[i] for i in sorted(set(neighbors.tolist()))]
+
+
+    def get_cost_ratio(self, configuration_obj):
+        return self.get_cost_ratios([configuration_obj])[0]
+
+
+    def get_cost_ratios(self, configuration_objs):
+
+        # configurations are scored against the first configuration of the same variables scored, in time proportional
+        # to the edges incident to the variables whose kinds differ from it, as long as those are few, e.g., a delta
+        # of the search; all others are scored together, as long as they assign kinds to the same variables
+        costs = np.empty(len(configuration_objs))
+        groups = {}
+        for i, configuration_obj in enumerate(configuration_objs):
+            var_names = tuple(configuration_obj["config"].keys())
+            if var_names not in self._get_incremental_costs():
+                self._incremental_costs[var_names] = (self.get_incremental_cost(configuration_obj["config"]), dict(configuration_obj["config"]))
+            incremental_cost, base_configuration = self._incremental_costs[var_names]
+            changes = {var_name : kind for var_name, kind in configuration_obj["config"].items() if kind != base_configuration[var_name]}
+            if len(changes) <= max(1, len(var_names) // INCREMENTAL_SHARE):
+                costs[i], _ = incremental_cost.get_cost(changes)
+            else:
+                groups.setdefault(var_names, []).append(i)
+        for var_names, rows in groups.items():
+            get_kinds = itemgetter(*var_names)
+            kind_matrix = [get_kinds(configuration_objs[i]["config"]) for i in rows]
+            costs[rows], _ = self.get_costs(var_names, kind_matrix)
 
         # for the first configuration, we must set the original cost
         if self.original_cost == None:
-            self.original_cost = cost
-        
-        return cost, deltas
+            self.original_cost = float(costs[0])
+
+        return self.original_cost / costs
 
 
-    def update_edge_weights(self, subgraph_nodes, custom={}):
+    def _get_incremental_costs(self):
 
-        intra_mixed_change = 0
-        intra_low_change = 0
-        inter_mixed_change = 0
-        inter_low_change = 0
+        # {variables : (IncrementalCost, base configuration)}, rebuilt on demand, see __getstate__
+        if getattr(self, "_incremental_costs", None) is None:
+            self._incremental_costs = {}
+        return self._incremental_costs
 
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_incremental_costs", None)
+        return state
+
+
+    def get_cost(self, configuration, custom={}):
+
+        costs, deltas = self.get_costs(list(configuration.keys()), [list(configuration.values())], custom)
+        return float(costs[0]), {change_name : float(changes[0]) for change_name, changes in deltas.items()}
+
+
+    def get_incremental_cost(self, configuration, custom={}):
+        return IncrementalCost(self, configuration, custom)
+
+
+    def get_costs(self, var_names, kind_matrix, custom={}):
+
+        # scores configurations of the given variables, one per row of the kind matrix, and returns their costs
+        # along with the intra/inter mixed/low changes in cost, as arrays with one entry per configuration
+        target_indices = np.array([self.var_indices[var_name] for var_name in var_names], dtype=np.int64)
+        kind_matrix = np.asarray(kind_matrix)
+        if kind_matrix.dtype.kind in "USO":
+
+            # kinds in configurations are strings; only the few distinct ones are parsed
+            kind_values, kind_codes = np.unique(kind_matrix, return_inverse=True)
+            kind_matrix = np.array([int(kind) for kind in kind_values], dtype=np.int64)[kind_codes.reshape(kind_matrix.shape)]
+        kind_matrix = kind_matrix.astype(np.int64).reshape(-1, len(target_indices))
+        num_configurations = kind_matrix.shape[0]
+
+        subgraph_edges = self._get_subgraph_edges(target_indices)
+
+        # only edges with a targeted endpoint can change precision; all others add their weight to every cost
+        is_targeted = np.zeros(len(self.var_names), dtype=bool)
+        is_targeted[target_indices] = True
+        varying = is_targeted[self.edge_sources[subgraph_edges]] | is_targeted[self.edge_targets[subgraph_edges]]
+        fixed_cost = np.sum(np.abs(self.edge_weights[subgraph_edges[~varying]]))
+        subgraph_edges = subgraph_edges[varying]
+
+        weights = self.edge_weights[subgraph_edges]
+        is_inter = self.edge_is_inter[subgraph_edges]
+        has_dim = ~np.isnan(self.edge_dims[subgraph_edges])
+        mixed_weights, low_weights = self.update_edge_weights(weights, is_inter, self.edge_dims[subgraph_edges], custom)
+
+        # per edge, the change in cost if the edge becomes mixed or low precision
+        mixed_cost_changes = np.abs(mixed_weights) - np.abs(weights)
+        low_cost_changes = np.abs(low_weights) - np.abs(weights)
+        edge_changes = {
+            "intra_mixed_change" : (12, np.where(is_inter, 0, mixed_weights - weights)),
+            "intra_low_change" : (8, np.where(is_inter, 0, low_weights - weights)),
+            "inter_mixed_change" : (12, np.where(is_inter, mixed_cost_changes, 0)),
+            "inter_low_change" : (8, np.where(is_inter, low_cost_changes, 0)),
+        }
+
+        # columns of the kind matrix holding the kinds of the endpoints of each edge; other variables keep the default kind
+        columns = np.full(len(self.var_names), -1, dtype=np.int64)
+        columns[target_indices] = np.arange(len(target_indices))
+        source_columns = columns[self.edge_sources[subgraph_edges]]
+        target_columns = columns[self.edge_targets[subgraph_edges]]
+
+        costs = np.empty(num_configurations)
+        deltas = {change_name : np.empty(num_configurations) for change_name in edge_changes}
+        chunk_size = max(1, CHUNK_SIZE // max(1, len(subgraph_edges)))
+        for start in range(0, num_configurations, chunk_size):
+            kinds = kind_matrix[start:start + chunk_size]
+            source_kinds = np.where(source_columns >= 0, kinds[:, source_columns], DEFAULT_KIND)
+            target_kinds = np.where(target_columns >= 0, kinds[:, target_columns], DEFAULT_KIND)
+            kind_sums = source_kinds + target_kinds
+
+            # an edge joins two low precision variables (8), a low and a high precision one (12), or two high precision ones (16)
+            assert(np.all((kind_sums == 8) | (kind_sums == 12) | (kind_sums == 16)))
+            assert(not np.any((kind_sums != 16) & is_inter & ~has_dim))
+
+            is_mixed = (kind_sums == 12).astype(np.float64)
+            is_low = (kind_sums == 8).astype(np.float64)
+            costs[start:start + chunk_size] = fixed_cost + np.sum(np.abs(weights)) + is_mixed @ mixed_cost_changes + is_low @ low_cost_changes
+            for change_name, (kind_sum, changes) in edge_changes.items():
+                deltas[change_name][start:start + chunk_size] = (is_mixed if kind_sum == 12 else is_low) @ changes
+
+        return costs, deltas
+
+
+    @staticmethod
+    def update_edge_weights(weights, is_inter, dims, custom={}):
+
+        # the weights of edges once they become mixed and once they become low precision; the cost functions,
+        # including custom ones, are applied to arrays of edge weights and dimensions
         if custom:
            intra_mixed = custom["intra_mixed"]
            intra_low = custom["intra_low"]
@@ -104,81 +239,96 @@ class VariableInteractionGraph:
             inter_mixed = lambda weight, dim : abs(2 * weight * (1 + dim))
             inter_low = lambda weight, dim : abs(weight)
 
-        sub_G = self.G.subgraph(subgraph_nodes)
-        edge_weights = nx.get_edge_attributes(sub_G, "weight")
-        for edge in sub_G.edges():
-
-            scopedVarName0 = edge[0]
-            scopedVarName1 = edge[1]
-            node1_kind = int(self.G.nodes[scopedVarName0]['kind'])
-            node2_kind = int(self.G.nodes[scopedVarName1]['kind'])
-
-            # mixed precision case
-            if node1_kind + node2_kind == 12:
-                
-                # cost equal to original weight * (1 + dim) for interprocedural flow
-                # double cost for intraprocedural flow
-                if edge_weights[edge] < 0:
-                    target_scope0 = self.G.nodes[scopedVarName0]['scope']
-                    dim0 = self.sourceTransformers[target_scope0].variable_profile[scopedVarName0]["dim"]
-
-                    target_scope1 = self.G.nodes[scopedVarName1]['scope']
-                    dim1 = self.sourceTransformers[target_scope1].variable_profile[scopedVarName1]["dim"]
-
-                    dim = min(dim0,dim1)
-
-                    new_weight = inter_mixed(edge_weights[edge], dim)
-                    inter_mixed_change += (abs(new_weight) - abs(edge_weights[edge]))
-                    edge_weights[edge] =  new_weight
-                else:
-                    new_weight = intra_mixed(edge_weights[edge])
-                    intra_mixed_change += (new_weight - edge_weights[edge])
-                    edge_weights[edge] =  new_weight
-
-            # reduced precision case
-            elif node1_kind + node2_kind == 8:
-                
-                # no change in cost for interprocedural dataflow
-                # half cost for intraprocedural dataflow
-                if edge_weights[edge] < 0:
-                    target_scope0 = self.G.nodes[scopedVarName0]['scope']
-                    dim0 = self.sourceTransformers[target_scope0].variable_profile[scopedVarName0]["dim"]
-
-                    target_scope1 = self.G.nodes[scopedVarName1]['scope']
-                    dim1 = self.sourceTransformers[target_scope1].variable_profile[scopedVarName1]["dim"]
-
-                    dim = min(dim0,dim1)
-                    new_weight = inter_low(edge_weights[edge], dim)
-                    inter_low_change += (abs(new_weight) - abs(edge_weights[edge]))
-                    edge_weights[edge] =  new_weight
-
-                else:
-                    new_weight = intra_low(edge_weights[edge])
-                    intra_low_change += (new_weight - edge_weights[edge])
-                    edge_weights[edge] =  new_weight
-
-            # high precision case, no change since this is expected to be default
-            elif node1_kind + node2_kind == 16:
-                pass
-
-            else:
-                assert(False)
-
-
-        nx.set_edge_attributes(self.G, edge_weights, name="weight")
-
-        return {"intra_mixed_change" : intra_mixed_change,
-                "intra_low_change" : intra_low_change,
-                "inter_mixed_change" : inter_mixed_change,
-                "inter_low_change" : inter_low_change,}
-
+        # cost equal to original weight * (1 + dim) for mixed interprocedural flow, double cost for mixed intraprocedural flow;
+        # no change in cost for reduced interprocedural flow, half cost for reduced intraprocedural flow.
+        # interprocedural edges without a known dimension keep their weight; scoring asserts they never change precision
+        intra = ~is_inter
+        inter = is_inter & ~np.isnan(dims)
+        mixed_weights = weights.copy()
+        mixed_weights[intra] = intra_mixed(weights[intra])
+        mixed_weights[inter] = inter_mixed(weights[inter], dims[inter])
+        low_weights = weights.copy()
+        low_weights[intra] = intra_low(weights[intra])
+        low_weights[inter] = inter_low(weights[inter], dims[inter])
+
+        return mixed_weights, low_weights
+
+
+class IncrementalCost:
+    '''
+    Cost of a base configuration, kept per edge of its subgraph, from which the cost of a configuration of the same variables
+    is found in time proportional to the number of edges incident to the variables whose kinds differ from the base configuration
+    '''
+
+    # rows of the per-edge tables by the sum of the kinds of an edge's endpoints: high (16), mixed (12) and low (8) precision
+    ROW_OF_KIND_SUM = np.array([{16 : 0, 12 : 1, 8 : 2}.get(kind_sum, -1) for kind_sum in range(33)])
+    CHANGE_NAMES = ["intra_mixed_change", "intra_low_change", "inter_mixed_change", "inter_low_change"]
+
+    def __init__(self, G_var, configuration, custom={}):
+
+        # everything is kept for the subgraph only, i.e., its edges, in increasing order, and its variables, the targeted
+        # ones and their neighbors, in increasing order; the edges incident to a targeted variable are all in the subgraph
+        self.G_var = G_var
+        target_indices = np.array([G_var.var_indices[var_name] for var_name in configuration.keys()], dtype=np.int64)
+        self.subgraph_edges = G_var._get_subgraph_edges(target_indices)
+        self.subgraph_vars = np.unique(np.concatenate([target_indices, G_var.edge_sources[self.subgraph_edges], G_var.edge_targets[self.subgraph_edges]]))
+        self.is_targeted = np.zeros(len(self.subgraph_vars), dtype=bool)
+        self.is_targeted[np.searchsorted(self.subgraph_vars, target_indices)] = True
+        self.kinds = np.full(len(self.subgraph_vars), DEFAULT_KIND, dtype=np.int64)
+        self.kinds[np.searchsorted(self.subgraph_vars, target_indices)] = [int(kind) for kind in configuration.values()]
+        self.edge_sources = np.searchsorted(self.subgraph_vars, G_var.edge_sources[self.subgraph_edges])
+        self.edge_targets = np.searchsorted(self.subgraph_vars, G_var.edge_targets[self.subgraph_edges])
+
+        # for each edge and each of its precisions, the edge's cost followed by its contribution to each of the changes in cost
+        weights = G_var.edge_weights[self.subgraph_edges]
+        is_inter = G_var.edge_is_inter[self.subgraph_edges]
+        mixed_weights, low_weights = G_var.update_edge_weights(weights, is_inter, G_var.edge_dims[self.subgraph_edges], custom)
+        self.edge_values = np.zeros((3, len(self.subgraph_edges), 1 + len(self.CHANGE_NAMES)))
+        self.edge_values[:, :, 0] = [np.abs(weights), np.abs(mixed_weights), np.abs(low_weights)]
+        self.edge_values[1, :, 1] = np.where(is_inter, 0, mixed_weights - weights)
+        self.edge_values[2, :, 2] = np.where(is_inter, 0, low_weights - weights)
+        self.edge_values[1, :, 3] = np.where(is_inter, np.abs(mixed_weights) - np.abs(weights), 0)
+        self.edge_values[2, :, 4] = np.where(is_inter, np.abs(low_weights) - np.abs(weights), 0)
+
+        self.has_dim = ~(is_inter & np.isnan(G_var.edge_dims[self.subgraph_edges]))
+        self.totals = np.sum(self.edge_values[self._get_rows(np.arange(len(self.subgraph_edges))), np.arange(len(self.subgraph_edges))], axis=0)
+
+
+    def _get_rows(self, edges):
+
+        # edges are positions in the subgraph
+        kind_sums = self.kinds[self.edge_sources[edges]] + self.kinds[self.edge_targets[edges]]
+        rows = self.ROW_OF_KIND_SUM[np.clip(kind_sums, 0, len(self.ROW_OF_KIND_SUM) - 1)]
+
+        # an edge joins two low precision variables (8), a low and a high precision one (12), or two high precision ones (16)
+        assert(np.all(rows >= 0))
+        assert(np.all((rows == 0) | self.has_dim[edges]))
+        return rows
+
+
+    def _get_change(self, changes):
+
+        # the change in the totals, which only the edges incident to the changed variables make; the kinds of
+        # the changed variables are changed in place while those edges are scored, and changed back
+        var_indices = np.array([self.G_var.var_indices[var_name] for var_name in changes.keys()], dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.subgraph_vars, var_indices), len(self.subgraph_vars) - 1)
+        assert np.all(self.subgraph_vars[positions] == var_indices) and np.all(self.is_targeted[positions]), "only the kinds of variables in the base configuration can be changed"
+        edges = np.searchsorted(self.subgraph_edges, np.unique(self.G_var._get_incident_edges(var_indices)))
+        new_kinds = np.array([int(kind) for kind in changes.values()], dtype=np.int64)
+
+        old_kinds = self.kinds[positions]
+        old_values = np.sum(self.edge_values[self._get_rows(edges), edges], axis=0)
+        self.kinds[positions] = new_kinds
+        try:
+            new_values = np.sum(self.edge_values[self._get_rows(edges), edges], axis=0)
+        finally:
+            self.kinds[positions] = old_kinds
+        return new_values - old_values
 
-    def get_edge_weight_sum(self, subgraph_nodes):        
-        sub_G = self.G.subgraph(subgraph_nodes)
-        edge_weights = nx.get_edge_attributes(sub_G, "weight")
-        return sum([abs(x) for x in edge_weights.values()])
 
+    def get_cost(self, changes={}):
 
-    def reset_graph(self):
-        nx.set_node_attributes(self.G, {name : DEFAULT_KIND for name in self.var_names}, name="kind")
-        nx.set_edge_attributes(self.G, self.original_edge_weights, name="weight")
\ No newline at end of file
+        # cost and changes in cost of the base configuration with the kinds of some of its variables changed, as returned
+        # by VariableInteractionGraph.get_cost for the whole configuration; the base configuration is left as it is
+        totals = self.totals + self._get_change(changes)
+        return float(totals[0]), {change_name : float(totals[1 + i]) for i, change_name in enumerate(self.CHANGE_NAMES)}
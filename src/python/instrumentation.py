@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import numpy as np
+from contextlib import contextmanager
+from resultslog import append_records
+
+TRACE_EVENTS_PATH = "prose_workspace/__trace_events.jsonl"
+TRACE_PATH = "prose_logs/trace.json"
+
+
+class Histogram:
+    '''
+    Distribution of durations, in seconds, over power-of-two buckets; bucket i holds values in (2^(i-1), 2^i]
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.buckets = {}
+
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        bucket = int(np.ceil(np.log2(value))) if value > 0 else None
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+
+
+    def to_dict(self):
+
+        # buckets are keyed by their upper bound; the bucket of non-positive values by "0"
+        return {
+            "count" : self.count,
+            "total" : self.total,
+            "min" : self.min,
+            "max" : self.max,
+            "buckets" : {("0" if bucket is None else "{:g}".format(2.0**bucket)) : count for bucket, count in sorted(self.buckets.items(), key=lambda x: -np.inf if x[0] is None else x[0])},
+        }
+
+
+    @staticmethod
+    def from_dict(data):
+        histogram = Histogram()
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        for upper_bound, count in data["buckets"].items():
+            histogram.buckets[None if upper_bound == "0" else int(np.round(np.log2(float(upper_bound))))] = count
+        return histogram
+
+
+class Instrumentation:
+    '''
+    Timers, counters and histograms of one unit of work, e.g., testing one configuration;
+    every timed span is also kept as a Chrome trace event
+    '''
+
+    def __init__(self, trace_pid=0, trace_tid=0):
+        self.timers = {}
+        self.counters = {}
+        self.histograms = {}
+        self.trace_events = []
+        self.trace_pid = trace_pid
+        self.trace_tid = trace_tid
+
+
+    @contextmanager
+    def timer(self, name, **args):
+
+        # spans of the same name add up; each span is one sample of the histogram of that name
+        start = time.time()
+        try:
+            yield
+        finally:
+            duration = time.time() - start
+            self.timers[name] = self.timers.get(name, 0.0) + duration
+            self.observe(name, duration)
+            self.trace_events.append({
+                "name" : name,
+                "ph" : "X",
+                "ts" : start * 1e6,
+                "dur" : duration * 1e6,
+                "pid" : self.trace_pid,
+                "tid" : self.trace_tid,
+                "args" : args,
+            })
+
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+
+    def observe(self, name, value):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram()
+        self.histograms[name].add(value)
+
+
+    def get_summary(self):
+        return {
+            "timers" : dict(self.timers),
+            "counters" : dict(self.counters),
+            "histograms" : {name : histogram.to_dict() for name, histogram in self.histograms.items()},
+        }
+
+
+    def write_trace_events(self, path=TRACE_EVENTS_PATH):
+
+        # appended as one line per event, so that concurrent processes can share the file;
+        # see export_chrome_trace for turning them into a trace file
+        append_records(self.trace_events, path)
+        self.trace_events = []
+
+
+def merge_histograms(summaries):
+
+    # merges the histograms of several instrumentation summaries, e.g., those of all variants of a search
+    histograms = {}
+    for summary in summaries:
+        for name, data in summary.get("histograms", {}).items():
+            if name not in histograms:
+                histograms[name] = Histogram()
+            histograms[name].merge(Histogram.from_dict(data))
+    return histograms
+
+
+def export_chrome_trace(events_path=TRACE_EVENTS_PATH, trace_path=TRACE_PATH):
+
+    # writes the trace events recorded so far as a trace file that chrome://tracing and Perfetto load
+    events = []
+    if os.path.exists(events_path):
+        with open(events_path, "r") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+
+    with open(trace_path, "w") as f:
+        json.dump({"traceEvents" : events, "displayTimeUnit" : "ms"}, f)
@@ -1,5 +1,5 @@
 import re
-import subprocess
+from projectindex import get_project_index
 import os
 
 FORTRAN_DECLARATION_MODIFIERS = [
@@ -535,24 +535,7 @@ def parse_includes(src_lines, i, include_file_name, SETUP, excluded_names, fixed
     unique_found = False
     multiple_found = []
     for src_search_path in SETUP['machine']['src_search_paths'].split("|"):
-        if "/" not in include_file_name:
-            result = subprocess.run(
-                f"find {src_search_path} -type f -iname '{include_file_name}'",
-                shell=True,
-                stdout=subprocess.PIPE,
-                text=True,
-                executable="/bin/bash",
-            )
-        else:
-            result = subprocess.run(
-                f"find {src_search_path} -type f -wholename '{include_file_name}'",
-                shell=True,
-                stdout=subprocess.PIPE,
-                text=True,
-                executable="/bin/bash",
-            )
-
-        find_results = [x for x in result.stdout.split("\n") if x]
+        find_results = get_project_index(src_search_path).find_files(include_file_name)
         if len(find_results) == 1:
             unique_found = True
             depend_src_path = os.path.relpath(find_results[0])
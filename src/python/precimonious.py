@@ -1,23 +1,17 @@
-import subprocess
-import pickle
 import os
 from copy import deepcopy
 from math import ceil
+from search import SearchAlgorithm
+from resultslog import append_record
 
-class PrecimoniousSearch:
-
-    @staticmethod
-    def load(path="prose_workspace/__PrecimoniousSearch.pckl"):
-        with open(path, "rb") as f:
-            return pickle.load(f)
+class PrecimoniousSearch(SearchAlgorithm):
 
     def __init__(self, search_space):
+        super().__init__(search_space)
         self.available_kinds = {}
         self.config_template = {}
         self.config_queue = []
         self.delta_divisions = 1
-        self.cost_threshold = -1
-        self.completed_config_counter = 0
         self.current_best_configuration = {}
         self.improvement_flag = False
 
@@ -44,11 +38,6 @@ class PrecimoniousSearch:
         })
 
 
-    def save(self):
-        with open("prose_workspace/__PrecimoniousSearch.pckl", "wb") as f:
-            pickle.dump(self, f)
-
-
     def _to_highest_precision(self, target_variables):
         for var_name in target_variables:
             if len(self.available_kinds[var_name]) > 0:
@@ -67,10 +56,6 @@ class PrecimoniousSearch:
         return len(self._get_remaining_variable_names()) == 0
 
 
-    def set_cost_threshold(self, time):
-        self.cost_threshold = float(time)
-
-
     def feedback(self, configuration_dict):
         
         configuration_dict["configuration_number"] = self.completed_config_counter
@@ -92,17 +77,35 @@ class PrecimoniousSearch:
                     self.improvement_flag = True
 
         self.completed_config_counter += 1
-        self.save()
+
+
+    def get_cancellations(self):
+
+        # once a variant of the current batch passed, any variant with a larger delta can no longer
+        # become the best configuration, whatever its result, so testing it is of no use
+        if self.completed_config_counter == 0:
+            return []
+
+        passed = [self.current_best_configuration] + [configuration_dict for configuration_dict in self.finished_configurations.values() if configuration_dict["cost"] <= self.cost_threshold]
+        min_delta_len = min([len(configuration_dict["delta"]) for configuration_dict in passed])
+        return [configuration_number for configuration_number, configuration_dict in self.proposed_configurations.items()
+                if configuration_number not in self.finished_configurations and len(configuration_dict["delta"]) > min_delta_len]
 
 
     def _generate_next_batch(self):
 
         log_path = "prose_logs/{:0>4}/".format(self.completed_config_counter - 1)
 
-        subprocess.run(["touch", os.path.join(log_path, "FLAG_----------------------------BATCH_END")])
+        self._flag(log_path, "----------------------------BATCH_END")
+        batch_record = {
+            "record" : "batch",
+            "last_configuration_number" : self.completed_config_counter - 1,
+            "improvement" : self.current_best_configuration["configuration_number"] if self.improvement_flag else None,
+            "reset_delta" : False,
+        }
 
         if self.improvement_flag:
-            subprocess.run(["touch", os.path.join(log_path, "FLAG_IMPROVEMENT_DISCOVERED_IN_CONFIG_{:0>4}".format(self.current_best_configuration["configuration_number"]))])
+            self._flag(log_path, "IMPROVEMENT_DISCOVERED_IN_CONFIG_{:0>4}".format(self.current_best_configuration["configuration_number"]))
             self.improvement_flag = False
             
             # if the config is a delta inv, reduce divisions by one;
@@ -114,7 +117,7 @@ class PrecimoniousSearch:
 
         # otherwise, no new improvement was discovered in the last batch so we increase the granularity
         else:
-            subprocess.run(["touch", os.path.join(log_path, "FLAG_NO_IMPROVEMENT")])
+            self._flag(log_path, "NO_IMPROVEMENT")
             self.delta_divisions *= 2
 
         # if we cannot divide the current delta any further, it is minimal.
@@ -138,9 +141,14 @@ class PrecimoniousSearch:
             self.current_best_configuration["delta"] = self._get_remaining_variable_names()
             self.delta_divisions = 2
 
-            subprocess.run(["touch", os.path.join(log_path, "FLAG_RESET_DELTA")])
+            self._flag(log_path, "RESET_DELTA")
+            batch_record["reset_delta"] = True
 
-        subprocess.run(["touch", os.path.join(log_path, "FLAG_DELTA_{}_DIV_{}".format(len(self.current_best_configuration['delta']), self.delta_divisions))])
+        self._flag(log_path, "DELTA_{}_DIV_{}".format(len(self.current_best_configuration['delta']), self.delta_divisions))
+        batch_record["best_configuration_number"] = self.current_best_configuration["configuration_number"]
+        batch_record["delta_size"] = len(self.current_best_configuration['delta'])
+        batch_record["delta_divisions"] = self.delta_divisions
+        append_record(batch_record)
 
         if self._done():
             self.config_queue = None
@@ -148,6 +156,15 @@ class PrecimoniousSearch:
             self._create_deltas()
 
 
+    def _flag(self, log_path, flag_name):
+
+        # an empty marker file in the directory of the last configuration of the batch, if it is still there
+        try:
+            open(os.path.join(log_path, "FLAG_" + flag_name), "a").close()
+        except FileNotFoundError:
+            pass
+
+
     def get_next_batch(self):
 
         # run config 000 separately
@@ -0,0 +1,153 @@
+import os
+import re
+import json
+import hashlib
+import fnmatch
+import tempfile
+
+FORTRAN_EXTENSIONS = (".f90", ".f")
+PROJECT_INDEX_PATH = "prose_workspace/__project_index.json"
+
+# saved indices of another version were gathered with other patterns and are not used
+PROJECT_INDEX_VERSION = 2
+
+# line-by-line versions of the patterns the reducer and slicer used to grep for, i.e.,
+# '^\s*module\s+NAME(\s+|$)' and '^\s*use\s+NAME(,|\s+|$)', for every NAME at once; names may also be
+# followed by a comment, and use statements may also be given as "use :: NAME" and "use, NATURE :: NAME"
+MODULE_DEFINITION_RE = re.compile(r"^[^\S\n]*module[^\S\n]+(\w+)(?=!|[^\S\n]|$)", re.IGNORECASE | re.MULTILINE | re.ASCII)
+MODULE_USE_RE = re.compile(r"^[^\S\n]*use(?:[^\S\n]*,[^\S\n]*\w+[^\S\n]*::|[^\S\n]*::|[^\S\n])[^\S\n]*(\w+)(?=[,!]|[^\S\n]|$)", re.IGNORECASE | re.MULTILINE | re.ASCII)
+
+_project_indices = {}
+_project_index_settings = {"path" : PROJECT_INDEX_PATH, "use_digests" : False}
+
+
+def get_project_index(src_search_path):
+
+    # built on first use and kept until invalidated, e.g., once source files were written; what was gathered
+    # from each source file is saved, so that the next index of the same src search path only rereads changed files
+    if src_search_path not in _project_indices:
+        saved_indices = _load_saved_indices()
+        _project_indices[src_search_path] = ProjectIndex(
+            src_search_path,
+            saved_entries=saved_indices.get(os.path.abspath(src_search_path), {}),
+            use_digests=_project_index_settings["use_digests"],
+        )
+        print("\t ** indexed {}: {} source files, {} (re)scanned".format(src_search_path, len(_project_indices[src_search_path].entries), _project_indices[src_search_path].num_scanned_files))
+        if _project_index_settings["path"] is not None and os.path.isdir(os.path.dirname(_project_index_settings["path"])):
+            saved_indices[os.path.abspath(src_search_path)] = _project_indices[src_search_path].entries
+            _save_indices(saved_indices)
+    return _project_indices[src_search_path]
+
+
+def invalidate_project_indices(path=PROJECT_INDEX_PATH, use_digests=False):
+
+    # path is where indices are saved between runs, if anywhere; see ProjectIndex for use_digests
+    _project_indices.clear()
+    _project_index_settings["path"] = path
+    _project_index_settings["use_digests"] = use_digests
+
+
+def _load_saved_indices():
+    if _project_index_settings["path"] is None:
+        return {}
+    try:
+        with open(_project_index_settings["path"], "r") as f:
+            saved = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if not isinstance(saved, dict) or saved.get("version") != PROJECT_INDEX_VERSION:
+        return {}
+    return saved["indices"]
+
+
+def _save_indices(saved_indices):
+    fd, staging_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(_project_index_settings["path"])))
+    with os.fdopen(fd, "w") as f:
+        json.dump({"version" : PROJECT_INDEX_VERSION, "indices" : saved_indices}, f)
+    os.replace(staging_path, _project_index_settings["path"])
+
+
+class ProjectIndex:
+    '''
+    Fortran modules and files under one source search path, gathered in a single walk: the *.f90 and *.f
+    files defining and using each module, and every regular file by name, for resolving include directives.
+    The modules of a source file are taken from saved_entries instead if its size and mtime are unchanged,
+    or, with use_digests, if its content is
+    '''
+
+    def __init__(self, src_search_path, saved_entries=None, use_digests=False):
+        self.src_search_path = src_search_path
+        self.saved_entries = saved_entries if saved_entries is not None else {}
+        self.use_digests = use_digests
+        self.file_paths = []
+        self.file_paths_by_name = {}
+        self.module_definitions = {}
+        self.module_uses = {}
+
+        # {path relative to the src search path : entry}, for saving; includes linked source files
+        self.entries = {}
+        self.num_scanned_files = 0
+
+        # paths are given the way find prints them, i.e., joined to the search path; symbolic links are not followed,
+        # and source files linked into the search path are only indexed for their entries, e.g., for a build's dependencies
+        for dir_path, dir_names, file_names in os.walk(src_search_path):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                file_path = os.path.join(dir_path, file_name)
+                if os.path.islink(file_path) or not os.path.isfile(file_path):
+                    if os.path.isfile(file_path) and file_name.lower().endswith(FORTRAN_EXTENSIONS):
+                        self._index_src(file_path, linked=True)
+                    continue
+                self.file_paths.append(file_path)
+                self.file_paths_by_name.setdefault(file_name.lower(), []).append(file_path)
+                if file_name.lower().endswith(FORTRAN_EXTENSIONS):
+                    self._index_src(file_path)
+
+
+    def _index_src(self, src_path, linked=False):
+
+        stat = os.stat(src_path)
+        relative_path = os.path.relpath(src_path, self.src_search_path)
+        entry = self.saved_entries.get(relative_path)
+        if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+
+            # read as bytes, like grep, so that any encoding will do
+            with open(src_path, "rb") as f:
+                content = f.read()
+            digest = hashlib.sha256(content).hexdigest() if self.use_digests else None
+            if entry is None or digest is None or entry.get("digest") != digest:
+                text = content.decode("latin-1")
+                entry = {
+                    "module_definitions" : sorted(set([match.group(1).lower() for match in MODULE_DEFINITION_RE.finditer(text)])),
+                    "module_uses" : sorted(set([match.group(1).lower() for match in MODULE_USE_RE.finditer(text)])),
+                }
+                self.num_scanned_files += 1
+            entry = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns, digest=digest)
+        self.entries[relative_path] = entry
+        if linked:
+            return
+
+        for module_name in entry["module_definitions"]:
+            self.module_definitions.setdefault(module_name, []).append(src_path)
+        for module_name in entry["module_uses"]:
+            self.module_uses.setdefault(module_name, []).append(src_path)
+
+
+    def find_module_definitions(self, module_name):
+        ''' Returns the source files containing a module statement of the given module, which may include "module procedure" statements '''
+        return list(self.module_definitions.get(module_name.lower(), []))
+
+
+    def find_module_uses(self, module_name):
+        ''' Returns the source files containing a use statement of the given module '''
+        return list(self.module_uses.get(module_name.lower(), []))
+
+
+    def find_files(self, file_name):
+
+        # as find -iname for a file name and find -wholename for a path, e.g., of an include directive
+        if "/" in file_name:
+            return [file_path for file_path in self.file_paths if fnmatch.fnmatchcase(file_path, file_name)]
+        elif any([c in file_name for c in "*?["]):
+            return [file_path for file_path in self.file_paths if fnmatch.fnmatchcase(os.path.basename(file_path).lower(), file_name.lower())]
+        return list(self.file_paths_by_name.get(file_name.lower(), []))
@@ -0,0 +1,193 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+from projectindex import get_project_index
+
+MODULE_PATTERN = re.compile(r"^\s*module\s+(\w+)\s*(?:!.*)?$", re.IGNORECASE)
+USE_PATTERN = re.compile(r"^\s*use\s*(?:,\s*\w+\s*::|::)?\s*(\w+)\s*(?:,|(?:!.*)?$)", re.IGNORECASE)
+
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def digest_file(path):
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_staging_file(destination_path):
+
+    # temporary file next to the destination that can replace it; unlike mkstemp's
+    # default, the file gets the permissions of a regularly created file
+    fd, staging_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(destination_path)))
+    os.close(fd)
+    os.chmod(staging_path, 0o666 & ~UMASK)
+    return staging_path
+
+
+def break_hard_link(path):
+
+    # replaces a file that shares its inode with other project trees, e.g., of a hard link sandbox,
+    # by a copy of its own, such that changing it, or only its mtime, leaves the other trees alone
+    if os.stat(path).st_nlink > 1:
+        staging_path = make_staging_file(path)
+        try:
+            shutil.copy2(path, staging_path)
+            os.replace(staging_path, path)
+        except:
+            os.remove(staging_path)
+            raise
+
+
+def write_if_changed(source_path, destination_path):
+
+    # the destination is replaced rather than written in place, which also
+    # breaks any hard link it shares with another project tree
+    if os.path.exists(destination_path) and digest_file(source_path) == digest_file(destination_path):
+        return False
+
+    staging_path = make_staging_file(destination_path)
+    try:
+        shutil.copyfile(source_path, staging_path)
+        if os.path.exists(destination_path):
+            shutil.copymode(destination_path, staging_path)
+        os.replace(staging_path, destination_path)
+    except:
+        os.remove(staging_path)
+        raise
+    return True
+
+
+def scan_module_dependencies(src_search_paths):
+
+    # map each module to the source files declaring it, e.g., a file and a link to it, and each source file to the modules
+    # it uses, as found by the project index of each src search path, i.e., in the *.f90 and *.f files, including linked ones
+    module_name_to_src_paths = {}
+    src_path_to_used_module_names = {}
+    for src_search_path in src_search_paths:
+        for relative_path, entry in get_project_index(src_search_path).entries.items():
+            src_path = os.path.relpath(os.path.join(src_search_path, relative_path))
+            for module_name in entry["module_definitions"]:
+                if module_name != "procedure":
+                    module_name_to_src_paths.setdefault(module_name, set()).add(src_path)
+            src_path_to_used_module_names[src_path] = set(entry["module_uses"])
+
+    return module_name_to_src_paths, src_path_to_used_module_names
+
+
+def get_recompile_set(changed_src_paths, module_dependencies):
+
+    # a change to a source file can change the .mod files of the modules it declares,
+    # so everything that uses those modules, directly or not, has to be recompiled as well
+    module_name_to_src_paths, src_path_to_used_module_names = module_dependencies
+    src_path_to_user_src_paths = {}
+    for src_path, used_module_names in src_path_to_used_module_names.items():
+        for module_name in used_module_names:
+            for module_src_path in module_name_to_src_paths.get(module_name, set()):
+                if module_src_path != src_path:
+                    src_path_to_user_src_paths.setdefault(module_src_path, set()).add(src_path)
+
+    recompile_set = set(changed_src_paths)
+    stack = list(changed_src_paths)
+    while len(stack) != 0:
+        src_path = stack.pop()
+        for user_src_path in src_path_to_user_src_paths.get(src_path, set()):
+            if user_src_path not in recompile_set:
+                recompile_set.add(user_src_path)
+                stack.append(user_src_path)
+
+    return recompile_set
+
+
+class RebuildDriver:
+    '''
+    Installs transformed source files into a project tree such that only files
+    whose content differs from the last successful build look out of date to the build system
+    '''
+
+    def __init__(self, working_dir):
+
+        self.working_dir = working_dir
+        self.state_path = os.path.join(working_dir, "prose_workspace/__build_state.json")
+
+        # for each source file, the digest and mtime of the content the current build products were built from
+        try:
+            with open(self.state_path, "r") as f:
+                self.state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.state = {}
+
+        self.installed = {}
+        self.changed_src_paths = set()
+
+
+    def install(self, source_path, src_path):
+
+        destination_path = os.path.join(self.working_dir, src_path)
+        digest = digest_file(source_path)
+        write_if_changed(source_path, destination_path)
+        self.installed[src_path] = digest
+
+        # an unchanged file may still be linked to the snapshot, whose mtime must not move along
+        break_hard_link(destination_path)
+
+        # content that was built before gets its mtime back so that it is not recompiled;
+        # anything else must look newer than whatever was built from it
+        if src_path in self.state and self.state[src_path]["digest"] == digest:
+            os.utime(destination_path, ns=(self.state[src_path]["mtime_ns"], self.state[src_path]["mtime_ns"]))
+            return False
+        else:
+            os.utime(destination_path)
+            self.changed_src_paths.add(src_path)
+            return True
+
+
+    def needs_build(self):
+        return len(self.changed_src_paths) > 0
+
+
+    def begin_build(self):
+
+        # a failed build may leave build products behind for any of the changed files,
+        # so they are forgotten until a build succeeds
+        for src_path in self.changed_src_paths:
+            self.state.pop(src_path, None)
+        self._save()
+
+
+    def finish_build(self):
+
+        for src_path, digest in self.installed.items():
+            self.state[src_path] = {
+                "digest" : digest,
+                "mtime_ns" : os.stat(os.path.join(self.working_dir, src_path)).st_mtime_ns,
+            }
+        self._save()
+
+
+    def report(self, configuration_dir, module_dependencies):
+
+        recompile_set = get_recompile_set(self.changed_src_paths, module_dependencies)
+        with open(os.path.join(configuration_dir, "rebuild.txt"), "w") as f:
+            f.write("changed:\n")
+            for src_path in sorted(self.changed_src_paths):
+                f.write("\t{}\n".format(src_path))
+            f.write("recompile:\n")
+            for src_path in sorted(recompile_set):
+                f.write("\t{}\n".format(src_path))
+        return recompile_set
+
+
+    def _save(self):
+
+        fd, staging_path = tempfile.mkstemp(dir=os.path.dirname(self.state_path))
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.state, f)
+        os.replace(staging_path, self.state_path)
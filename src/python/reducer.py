@@ -1,9 +1,13 @@
 import subprocess
 import os
+import sys
+import heapq
+import multiprocessing as mp
 import parsing
 import re
 from shutil import copy
 from glob import glob
+from projectindex import PROJECT_INDEX_PATH, get_project_index, invalidate_project_indices
 
 SETUP = None
 SRC_FILES = set()
@@ -15,6 +19,7 @@ MODULE_NAME_TO_SRC_FILE_MAP = {}
 EXCLUDED_NAMES = set()
 PROCEDURE_CALL_DEPENDENCIES = set()
 SEARCH_SPACE = set()
+TAINT_WORKLIST = None
 
 # TODO: handle statement labels in fixed form fortran
 
@@ -40,70 +45,54 @@ def _reduce(setup_dict):
     global EXCLUDED_NAMES
     global PROCEDURE_CALL_DEPENDENCIES
     global SEARCH_SPACE
+    global TAINT_WORKLIST
 
     SETUP = setup_dict
 
+    # modules are looked up in an index of each src search path, built once, as the files are at this point
+    invalidate_project_indices(path=os.path.join(os.environ['PROSE_EXPERIMENT_DIR'], PROJECT_INDEX_PATH), use_digests=SETUP['machine']['index_digests'] == 'true')
+
     # first pass
     # 1. register all the scope symbols, variable declarations, variable symbols, and procedure calls in the targeted src code
     # 2. assign "target" attribute to all targeted FP variables
     print("** Pass 1/3")
 
+    # the index of each src search path is built before any source file is parsed, such that parse workers share it
+    for src_search_path in SETUP['machine']['src_search_paths'].split("|"):
+        get_project_index(src_search_path)
+
     # targeted src code
-    for src_path in SETUP['target']['src_files'].split("|"):
-        print(f"\t{src_path}")
-        s = SourceFile(src_path)
+    for s in _parse_src_files(SETUP['target']['src_files'].split("|")):
         s.is_targeted = True
-        SRC_FILES.add(s)
-        TARGETED_SRC_FILES.add(s)
-        PATH_TO_SRC_FILE_MAP[s.src_path] = s
-        for module_name in s.module_names:
-            MODULE_NAME_TO_SRC_FILE_MAP[module_name] = s
+        _register_src_file(s, TARGETED_SRC_FILES)
     
     with open("prose_logs/__config_template.txt", "w") as f:
         f.writelines(SEARCH_SPACE)
 
     # src code that is "upstream" from targeted src code
+    upstream_src_paths = []
     for src_file in TARGETED_SRC_FILES:
         for src_path in src_file.upstream_src_paths:
-            if src_path not in PATH_TO_SRC_FILE_MAP.keys():
-                print(f"\t{src_path}")
-                s = SourceFile(src_path)
-                SRC_FILES.add(s)
-                UPSTREAM_SRC_FILES.add(s)
-                PATH_TO_SRC_FILE_MAP[s.src_path] = s
-                for module_name in s.module_names:
-                    MODULE_NAME_TO_SRC_FILE_MAP[module_name] = s
+            if src_path not in PATH_TO_SRC_FILE_MAP.keys() and src_path not in upstream_src_paths:
+                upstream_src_paths.append(src_path)
+    for s in _parse_src_files(upstream_src_paths):
+        _register_src_file(s, UPSTREAM_SRC_FILES)
 
     # src code that is "downstream" from both "targeted" and "upstream" source code
-    for src_file in set.union(TARGETED_SRC_FILES, UPSTREAM_SRC_FILES):
-        for src_path in src_file.module_name_to_downstream_src_path_map.values():
-            if src_path not in PATH_TO_SRC_FILE_MAP.keys():
-                print(f"\t{src_path}")
-                s = SourceFile(src_path)
-                SRC_FILES.add(s)
-                DOWNSTREAM_SRC_FILES.add(s)
-                PATH_TO_SRC_FILE_MAP[s.src_path] = s
-                for module_name in s.module_names:
-                    MODULE_NAME_TO_SRC_FILE_MAP[module_name] = s
-
-    # src code that is "downstream" from "downstream" source code
+    # and, up to a fixed point, src code that is "downstream" from "downstream" source code
+    src_files = set.union(TARGETED_SRC_FILES, UPSTREAM_SRC_FILES)
     fixed_point = False
     while not fixed_point:
 
-        new_downstream = set()
-        for src_file in DOWNSTREAM_SRC_FILES:
+        new_downstream = []
+        for src_file in src_files:
             for downstream_src_path in src_file.module_name_to_downstream_src_path_map.values():
-                if downstream_src_path not in PATH_TO_SRC_FILE_MAP.keys():
-                    new_downstream.add(downstream_src_path)
-        
-        for src_path in new_downstream:
-            print(f"\t{src_path}")
-            s = SourceFile(src_path)
-            SRC_FILES.add(s)
-            DOWNSTREAM_SRC_FILES.add(s)
-            PATH_TO_SRC_FILE_MAP[s.src_path] = s
-            for module_name in s.module_names:
-                MODULE_NAME_TO_SRC_FILE_MAP[module_name] = s
+                if downstream_src_path not in PATH_TO_SRC_FILE_MAP.keys() and downstream_src_path not in new_downstream:
+                    new_downstream.append(downstream_src_path)
+
+        src_files = _parse_src_files(new_downstream)
+        for s in src_files:
+            _register_src_file(s, DOWNSTREAM_SRC_FILES)
 
         fixed_point = len(new_downstream) == 0
 
@@ -121,14 +110,13 @@ def _reduce(setup_dict):
     # 2. propagate taint to all variables used in the declaration of targeted or tainted variables
     # 3. propagate taint to all variables declared within the same procedure as targeted or tainted variables
     print("** Pass 3/3")
-    fixed_point = False
-    while not fixed_point:
-
-        new_taint_count = 0
-        for s in SRC_FILES:
-            new_taint_count += s.propagate_taint()
-        
-        fixed_point = new_taint_count == 0
+    tainters = []
+    for s in SRC_FILES:
+        s.collect_tainters(tainters)
+    TAINT_WORKLIST = TaintWorklist(tainters)
+    num_checks = TAINT_WORKLIST.propagate()
+    TAINT_WORKLIST = None
+    print(f"\t {num_checks} taint checks of {len(tainters)} statements")
 
     # unparse minimal required source code, which consists of:
     # - any scope containing references to targeted or tainted variables
@@ -216,6 +204,94 @@ def _reduce(setup_dict):
     return [s.src_path for s in process_order]
 
 
+def _register_src_file(s, src_file_group):
+
+    global SRC_FILES
+    global PATH_TO_SRC_FILE_MAP
+    global MODULE_NAME_TO_SRC_FILE_MAP
+
+    SRC_FILES.add(s)
+    src_file_group.add(s)
+    PATH_TO_SRC_FILE_MAP[s.src_path] = s
+    for module_name in s.module_names:
+        MODULE_NAME_TO_SRC_FILE_MAP[module_name] = s
+
+
+def _parse_src_files(src_paths):
+
+    global SETUP
+    global EXCLUDED_NAMES
+    global SEARCH_SPACE
+
+    for src_path in src_paths:
+        print(f"\t{src_path}")
+
+    # source files of the same wave do not depend on each other, so they can be parsed by forked workers,
+    # which send back the parsed source file along with the names they excluded and the variables they targeted
+    num_workers = min(int(SETUP['machine']['parse_workers']), len(src_paths))
+    if num_workers <= 1:
+        return [SourceFile(src_path) for src_path in src_paths]
+
+    src_files = []
+    with mp.get_context("fork").Pool(num_workers) as pool:
+        for s, excluded_names, search_space in pool.imap(_parse_src_file, src_paths):
+            src_files.append(s)
+            EXCLUDED_NAMES.update(excluded_names)
+            SEARCH_SPACE.update(search_space)
+    return src_files
+
+
+def _parse_src_file(src_path):
+
+    global EXCLUDED_NAMES
+    global SEARCH_SPACE
+
+    # runs in a parse worker; parse trees are deep, so pickling them back may need more than the default recursion limit
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    s = SourceFile(src_path)
+    return s, EXCLUDED_NAMES, SEARCH_SPACE
+
+
+class TaintWorklist:
+    '''
+    Tainter statements still to be checked for taint, i.e., procedure calls and variable declarations, in the order
+    in which repeated sweeps over all source files would check them. Whether a procedure call is tainted only depends
+    on targeted variables and procedures, so it is checked once; a variable declaration is checked again once one
+    of its declared variables is tainted, later in the same sweep if it comes after the statement being checked
+    and in the next sweep otherwise
+    '''
+
+    def __init__(self, tainters):
+        self.tainters = tainters
+        self.positions = {tainter : position for position, tainter in enumerate(tainters)}
+
+        # (sweep, position) of each statement to check, and of the statement being checked
+        self.heap = [(0, position) for position in range(len(tainters))]
+        self.queued = set(range(len(tainters)))
+        self.current = (0, -1)
+
+
+    def add(self, tainter):
+        position = self.positions.get(tainter)
+        if position is None or position in self.queued or tainter.is_tainted:
+            return
+        sweep, current_position = self.current
+        heapq.heappush(self.heap, (sweep if position > current_position else sweep + 1, position))
+        self.queued.add(position)
+
+
+    def propagate(self):
+
+        # returns the number of checks, which the sweeps used to make sweeps x statements of
+        num_checks = 0
+        while self.heap:
+            self.current = heapq.heappop(self.heap)
+            self.queued.remove(self.current[1])
+            self.tainters[self.current[1]].propagate_taint(new_taint_count=0)
+            num_checks += 1
+        return num_checks
+
+
 class Node:
 
     def __init__(self, parent):
@@ -267,6 +343,10 @@ class Scope(Node):
         self.use_statements = []
         self.symbol_table = {}
 
+        # name -> nodes indexes of the symbol table and of the references of the use statements, built on first lookup
+        self._local_name_index = None
+        self._imported_name_index = None
+
 
     def unparse_to_string(self):
         return [line if isinstance(line, str) else line.text for line in self.get_enclosing_src_file().src_lines[self.start_idx:self.end_idx + 1]]
@@ -287,6 +367,31 @@ class Scope(Node):
         return False
 
 
+    def find_local_symbols(self, name):
+
+        # nodes of the symbol table with the given name, in symbol table order;
+        # the symbol table does not change once the scope is parsed
+        if self._local_name_index is None:
+            self._local_name_index = {}
+            for node in self.symbol_table.values():
+                if hasattr(node, "name"):
+                    self._local_name_index.setdefault(node.name, []).append(node)
+        return self._local_name_index.get(name, [])
+
+
+    def find_imported_symbols(self, name):
+
+        # nodes imported by the use statements of this scope with the given name, in use statement order;
+        # the index is rebuilt whenever one of the use statements has resolved its references
+        if self._imported_name_index is None:
+            self._imported_name_index = {}
+            for use_statement in self.use_statements:
+                for node in use_statement.resolved_references.values():
+                    if hasattr(node, "name"):
+                        self._imported_name_index.setdefault(node.name, []).append(node)
+        return self._imported_name_index.get(name, [])
+
+
     def get_scoped_name(self):
                 
         scoped_name = self.name
@@ -356,17 +461,19 @@ class Scope(Node):
         return self.end_idx
 
 
-    def propagate_taint(self, src_lines, new_taint_count):
+    def collect_tainters(self, src_lines, tainters):
         i = self.start_idx
         while i + 1 < self.end_idx:
             i += 1
 
             if isinstance(src_lines[i], Scope):
-                i, new_taint_count = src_lines[i].propagate_taint(src_lines, new_taint_count)
-            elif isinstance(src_lines[i], (UseStatement, StatementWithProcedureCalls, VariableDeclaration)):
-                new_taint_count = src_lines[i].propagate_taint(new_taint_count)
+                i = src_lines[i].collect_tainters(src_lines, tainters)
+            elif isinstance(src_lines[i], StatementWithProcedureCalls):
+                tainters += src_lines[i].procedure_calls
+            elif isinstance(src_lines[i], VariableDeclaration):
+                tainters.append(src_lines[i])
 
-        return self.end_idx, new_taint_count
+        return self.end_idx
 
 
     def _scope_end(self, src_lines, i):
@@ -459,14 +566,7 @@ class Scope(Node):
             unique_found = False
             multiple_found = []
             for src_search_path in SETUP['machine']['src_search_paths'].split("|"):
-                result = subprocess.run(
-                    f"find {src_search_path} -type f -iname '*.f90' -o -type f -iname '*.f' | xargs -r -n 128 -P 16 grep -lirE '^\s*module\s+{module_name}(\s+|$)'",
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                    text=True,
-                    executable="/bin/bash",
-                )
-                grep_results = [os.path.relpath(x) for x in result.stdout.split("\n") if x]
+                grep_results = [os.path.relpath(x) for x in get_project_index(src_search_path).find_module_definitions(module_name)]
                 if len(grep_results) == 1:
                     unique_found = True
                     module_name_to_downstream_src_path_map[module_name] = grep_results[0]
@@ -549,24 +649,13 @@ class Resolver(Statement):
         while node.parent:
             node = node.parent
 
-            # check for locally-declared matches
-            for child_node in node.symbol_table.values():
-                if isinstance(child_node, Variable) and child_node.name == derived_type_name:
+            # check for locally-declared matches, then for imported matches
+            for child_node in node.find_local_symbols(derived_type_name) + node.find_imported_symbols(derived_type_name):
+                if isinstance(child_node, Variable):
                     for reference in child_node.parent.resolved_references.values():
                         if isinstance(reference, DerivedType):
-                            for grandchild_node in reference.symbol_table.values():
-                                if grandchild_node.name == derived_type_field_reference:
-                                    return grandchild_node
-
-            # check for imported matches
-            for use_statement in node.use_statements:
-                for child_node in use_statement.resolved_references.values():
-                    if isinstance(child_node, Variable) and child_node.name == derived_type_name:
-                        for reference in child_node.parent.resolved_references.values():
-                            if isinstance(reference, DerivedType):
-                                for grandchild_node in reference.symbol_table.values():
-                                    if grandchild_node.name == derived_type_field_reference:
-                                        return grandchild_node
+                            for grandchild_node in reference.find_local_symbols(derived_type_field_reference):
+                                return grandchild_node
 
         # no matches found
         # check for a pointer variable which could be pointing to the derived type
@@ -590,16 +679,15 @@ class Resolver(Statement):
             node = node.parent
 
             # check for locally-declared matches
-            for child_node in node.symbol_table.values():
-                if isinstance(child_node, reference_types) and child_node.name == target_name:
+            for child_node in node.find_local_symbols(target_name):
+                if isinstance(child_node, reference_types):
                     return child_node
 
             # check for imported matches unless the parent is an interface which should only contain procedure references 
             if not isinstance(self.parent, Interface):
-                for use_statement in node.use_statements:
-                    for child_node in use_statement.resolved_references.values():
-                        if isinstance(child_node, reference_types) and child_node.name == target_name:
-                            return child_node
+                for child_node in node.find_imported_symbols(target_name):
+                    if isinstance(child_node, reference_types):
+                        return child_node
 
         # no matches found
         return None
@@ -783,9 +871,8 @@ class SourceFile(Scope):
         super().resolve_references(self.src_lines)
 
     
-    def propagate_taint(self):
-        _, new_taint_count = super().propagate_taint(src_lines=self.src_lines, new_taint_count=0)
-        return new_taint_count
+    def collect_tainters(self, tainters):
+        super().collect_tainters(src_lines=self.src_lines, tainters=tainters)
 
         
     def register_upstream_src(self):
@@ -795,16 +882,8 @@ class SourceFile(Scope):
         # for any module declared in this source file, find src containing "use" statements that import that module
         for module_name in self.module_names:    
             for src_search_path in SETUP['machine']['src_search_paths'].split("|"):
-                result = subprocess.run(
-                    f"find {src_search_path} -type f -iname '*.f90' -o -type f -iname '*.f' | xargs -r -n 128 -P 16 grep -lirE '^\s*use\s+{module_name}(,|\s+|$)'",
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                    text=True,
-                    executable="/bin/bash",
-                )
-
                 # if we found upstream src files on this src_search_path, parse them and break
-                paths = [os.path.relpath(x) for x in result.stdout.split("\n") if x]
+                paths = [os.path.relpath(x) for x in get_project_index(src_search_path).find_module_uses(module_name)]
                 if paths:
                     self.upstream_src_paths = set(paths)
                     break
@@ -952,13 +1031,6 @@ class StatementWithProcedureCalls(Statement):
         super().unparse(file)
 
 
-    def propagate_taint(self, new_taint_count):
-        for procedure_call in self.procedure_calls:
-            new_taint_count += procedure_call.propagate_taint(new_taint_count)
-
-        return new_taint_count
-
-
     @Node.is_tainted.getter
     def is_tainted(self):
         return any([procedure_call.is_tainted for procedure_call in self.procedure_calls])
@@ -1064,6 +1136,7 @@ class UseStatement(Resolver):
         external_module = MODULE_NAME_TO_SRC_FILE_MAP[self.module_name].symbol_table["::" + self.module_name]
         for node in external_module.symbol_table.values():
             self.resolved_references[node.scoped_name] = node
+        self.parent._imported_name_index = None
 
 
 class Variable(Node):
@@ -1077,6 +1150,15 @@ class Variable(Node):
         self.is_tainted = self.is_targeted
 
 
+    @Node.is_tainted.setter
+    def is_tainted(self, value):
+
+        # the declaration of a newly tainted variable may now be tainted as well
+        if value and not self._is_tainted and TAINT_WORKLIST is not None:
+            TAINT_WORKLIST.add(self.parent)
+        self._is_tainted = value
+
+
     def _get_scoped_name(self):
         node = self.parent
         while not isinstance(node, Scope):
@@ -0,0 +1,68 @@
+import os
+import json
+
+RESULTS_LOG_PATH = "prose_logs/results.jsonl"
+
+
+def append_record(record, path=RESULTS_LOG_PATH):
+
+    # one line per record, written with a single O_APPEND write so that records of
+    # variants tested concurrently by separate processes are never interleaved
+    line = json.dumps(record, default=float) + "\n"
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line.encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+def append_records(records, path=RESULTS_LOG_PATH):
+
+    # as append_record, with all records in one write
+    if not records:
+        return
+    lines = "".join([json.dumps(record, default=float) + "\n" for record in records])
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, lines.encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+def read_records(path=RESULTS_LOG_PATH, record_type=None):
+
+    # yields the records of the log in the order they were written, optionally only those of one type;
+    # a line cut short by an interrupted search is skipped
+    if not os.path.exists(path):
+        return
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record_type is None or record["record"] == record_type:
+                yield record
+
+
+def get_variants(path=RESULTS_LOG_PATH):
+
+    # returns {configuration number : record} sorted by configuration number; a configuration
+    # tested again, e.g., after resuming an interrupted search, is represented by its last record
+    variants = {}
+    for record in read_records(path, "variant"):
+        variants[record["configuration_number"]] = record
+    return dict(sorted(variants.items()))
+
+
+def get_batches(path=RESULTS_LOG_PATH):
+    return list(read_records(path, "batch"))
+
+
+def get_cost(record):
+
+    # the cost reported by the eval command for a variant that ran to completion, passing or not;
+    # results cached before costs were recorded only have the cost of passing variants at hand
+    if record["cost"] is None and record["label"] == "PASSED":
+        return record["targeted_subset_cost"] if record["targeted_subset_cost"] != 0 else record["total_cost"]
+    return record["cost"]
@@ -0,0 +1,170 @@
+import os
+import shutil
+import tempfile
+import subprocess
+from fnmatch import fnmatch
+
+def _matches(path, patterns):
+    return any([fnmatch(os.path.basename(path), pattern) for pattern in patterns if pattern])
+
+
+class Sandbox:
+    '''
+    Private, writable view of a project snapshot in which a single variant is tested
+    '''
+
+    def __init__(self, snapshot_path, path, link_patterns="", copy_patterns=""):
+
+        self.snapshot_path = snapshot_path
+        self.path = path
+
+        # build products that are hard linked rather than copied, in modes that copy
+        self.link_patterns = link_patterns.split("|")
+
+        # files that are copied rather than hard linked, in modes that link, e.g., run outputs written in place
+        self.copy_patterns = copy_patterns.split("|")
+
+
+    @staticmethod
+    def new(mode, snapshot_path, path, link_patterns="", copy_patterns=""):
+        sandbox_class = {
+            "overlay" : OverlaySandbox,
+            "reflink" : ReflinkSandbox,
+            "hardlink" : HardlinkSandbox,
+            "copy" : CopySandbox,
+        }[mode]
+        return sandbox_class(snapshot_path, path, link_patterns, copy_patterns)
+
+
+    @staticmethod
+    def probe(sandbox_root, shared=False):
+
+        # pick the cheapest mode that works here; overlay mounts are local to a node and thus
+        # of no use for sandboxes shared with other nodes, while hard link farms are never picked
+        # on their own since they need to know which files are written in place
+        os.makedirs(sandbox_root, exist_ok=True)
+        probe_path = tempfile.mkdtemp(dir=sandbox_root)
+        try:
+            os.makedirs(os.path.join(probe_path, "snapshot"))
+            with open(os.path.join(probe_path, "snapshot", "probe"), "w") as f:
+                f.write("probe\n")
+
+            for mode in (["reflink"] if shared else ["overlay", "reflink"]):
+                sandbox = Sandbox.new(mode, os.path.join(probe_path, "snapshot"), os.path.join(probe_path, mode))
+                try:
+                    sandbox.create()
+                    return mode
+                except (subprocess.CalledProcessError, FileNotFoundError, OSError):
+                    pass
+                finally:
+                    sandbox.destroy()
+            return "copy"
+        finally:
+            shutil.rmtree(probe_path, ignore_errors=True)
+
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+
+    def create(self):
+        raise NotImplementedError
+
+
+    def destroy(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+    def _copy_function(self, src_path, dst_path):
+        if _matches(src_path, self.link_patterns):
+            os.link(src_path, dst_path)
+        else:
+            shutil.copy2(src_path, dst_path)
+
+
+class CopySandbox(Sandbox):
+    '''
+    Plain copy of the snapshot; works on any file system
+    '''
+
+    def create(self):
+        shutil.copytree(self.snapshot_path, self.path, symlinks=True, copy_function=self._copy_function)
+
+
+class ReflinkSandbox(Sandbox):
+    '''
+    Copy-on-write clone of the snapshot on file systems that support reflinks, e.g., btrfs and xfs
+    '''
+
+    def create(self):
+
+        subprocess.run(["cp", "-a", "--reflink=always", self.snapshot_path, self.path], check=True, stderr=subprocess.DEVNULL)
+
+        # swap the clones of build products for hard links
+        if [pattern for pattern in self.link_patterns if pattern]:
+            for dir_path, _, file_names in os.walk(self.snapshot_path):
+                for file_name in file_names:
+                    src_path = os.path.join(dir_path, file_name)
+                    if _matches(src_path, self.link_patterns) and not os.path.islink(src_path):
+                        dst_path = os.path.join(self.path, os.path.relpath(src_path, start=self.snapshot_path))
+                        os.remove(dst_path)
+                        os.link(src_path, dst_path)
+
+
+class HardlinkSandbox(Sandbox):
+    '''
+    Farm of hard links to the files of the snapshot. PROSE replaces the files it writes rather than rewriting
+    them in place, and breaks the link of a file before changing its mtime (see rebuild.write_if_changed and
+    rebuild.break_hard_link); for any other file, e.g., one written in place by the build or the model run,
+    correctness depends on the copy patterns alone
+    '''
+
+    def create(self):
+
+        def copy_function(src_path, dst_path):
+            if _matches(src_path, self.copy_patterns):
+                shutil.copy2(src_path, dst_path)
+            else:
+                os.link(src_path, dst_path)
+
+        shutil.copytree(self.snapshot_path, self.path, symlinks=True, copy_function=copy_function)
+
+
+class OverlaySandbox(Sandbox):
+    '''
+    Overlay file system with the snapshot as its read-only lower layer; only files written
+    in the sandbox, i.e., transformed sources, build outputs and run outputs, take up space
+    '''
+
+    def _get_layer_paths(self):
+        return os.path.join(self.path + ".overlay", "upper"), os.path.join(self.path + ".overlay", "work")
+
+
+    def create(self):
+
+        upper_path, work_path = self._get_layer_paths()
+        os.makedirs(upper_path)
+        os.makedirs(work_path)
+        os.makedirs(self.path)
+        options = "lowerdir={},upperdir={},workdir={}".format(self.snapshot_path, upper_path, work_path)
+
+        # unprivileged users need fuse-overlayfs; the kernel overlay file system needs privileges
+        if shutil.which("fuse-overlayfs"):
+            command = ["fuse-overlayfs", "-o", options, self.path]
+        else:
+            command = ["mount", "-t", "overlay", "overlay", "-o", options, self.path]
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+    def destroy(self):
+
+        if os.path.ismount(self.path):
+            if shutil.which("fusermount"):
+                result = subprocess.run(["fusermount", "-u", self.path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            if not shutil.which("fusermount") or result.returncode != 0:
+                subprocess.run(["umount", self.path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # never remove a sandbox that is still mounted
+        if not os.path.ismount(self.path):
+            shutil.rmtree(self.path, ignore_errors=True)
+            shutil.rmtree(self.path + ".overlay", ignore_errors=True)
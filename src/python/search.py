@@ -0,0 +1,186 @@
+import os
+import sys
+import pickle
+from importlib import import_module
+from store import get_store
+
+
+class SearchAlgorithm:
+    '''
+    Base class of search strategies.
+
+    Strategies implement get_next_batch() (or get_next() if their proposals do not depend on
+    feedback) and feedback(). Executors only use propose(), report() and get_cancellations(),
+    which let them keep every slot busy: configurations are handed out as soon as they can be
+    tested, results may be reported in any order, and they are fed back to the strategy in the
+    order the configurations were proposed.
+    '''
+
+    # whether the configurations proposed next depend on the feedback for earlier ones
+    proposals_depend_on_feedback = True
+
+    @classmethod
+    def get_checkpoint_path(cls):
+
+        # where searches started before the experiment store existed were checkpointed
+        return "prose_workspace/__{}.pckl".format(cls.__name__)
+
+
+    @classmethod
+    def has_checkpoint(cls):
+        return get_store().has_search_state(cls.__name__) or os.path.exists(cls.get_checkpoint_path())
+
+
+    @classmethod
+    def load(cls, path=None):
+
+        if path is None and get_store().has_search_state(cls.__name__):
+            search_algorithm = get_store().get_search_state([cls.__name__])[cls.__name__]
+        else:
+            with open(path or cls.get_checkpoint_path(), "rb") as f:
+                search_algorithm = pickle.load(f)
+
+        # results of configurations that were in flight when the search was interrupted are lost,
+        # so those configurations are proposed again, under the same configuration numbers
+        search_algorithm.finished_configurations = {}
+        search_algorithm.reproposals = sorted(search_algorithm.proposed_configurations.keys())
+        return search_algorithm
+
+
+    def __init__(self, search_space):
+        self.completed_config_counter = 0
+        self.cost_threshold = -1
+
+        # configurations proposed but not yet fed back and results reported ahead of their turn
+        self.next_configuration_number = 0
+        self.proposed_configurations = {}
+        self.finished_configurations = {}
+        self.reproposals = []
+        self.pending_configurations = []
+
+
+    def save(self):
+
+        # executors checkpoint the search algorithm along with the results fed back to it, see _report_result;
+        # proposals are not saved, since they are proposed again after a resume
+        get_store().put_search_state({type(self).__name__ : self})
+
+
+    def set_cost_threshold(self, time):
+        self.cost_threshold = float(time)
+
+
+    def get_next(self):
+        ''' Returns the next configuration to be tested or None once the search is done '''
+        raise NotImplementedError
+
+
+    def get_next_batch(self):
+        ''' Returns the next configurations to be tested, once all earlier ones were fed back, or an empty list/None once the search is done '''
+        raise NotImplementedError
+
+
+    def feedback(self, configuration_dict):
+        ''' Takes the result of a tested configuration, in the order configurations were proposed '''
+        self.completed_config_counter += 1
+
+
+    def get_num_remaining(self):
+        ''' Returns the number of configurations still to be tested, if known, or None '''
+        return None
+
+
+    def get_cancellations(self):
+        ''' Returns the numbers of configurations in flight whose results are no longer of any use '''
+        return []
+
+
+    def propose(self, max_count):
+
+        # returns up to max_count (configuration number, configuration) pairs that can be tested now;
+        # an empty list if more configurations can only be proposed once outstanding ones are reported,
+        # and None once the search is done
+        proposals = []
+        while self.reproposals and len(proposals) < max_count:
+            configuration_number = self.reproposals.pop(0)
+            proposals.append((configuration_number, self.proposed_configurations[configuration_number]))
+
+        # the default (first) configuration is tested on its own since it is the baseline for all others
+        outstanding = len(self.proposed_configurations) > 0
+        if self.completed_config_counter == 0 and (outstanding or proposals):
+            return proposals
+
+        while len(proposals) < max_count:
+
+            if not self.pending_configurations:
+                if not self.proposals_depend_on_feedback:
+                    configuration_dict = self.get_next()
+                    self.pending_configurations = [configuration_dict] if configuration_dict else None
+                elif not outstanding and not proposals:
+                    self.pending_configurations = self.get_next_batch() or None
+                else:
+                    break
+
+            if self.pending_configurations is None:
+                self.pending_configurations = []
+                if not outstanding and not proposals:
+                    return None
+                break
+
+            configuration_dict = self.pending_configurations.pop(0)
+            self.proposed_configurations[self.next_configuration_number] = configuration_dict
+            proposals.append((self.next_configuration_number, configuration_dict))
+            self.next_configuration_number += 1
+
+            if self.completed_config_counter == 0:
+                break
+
+        return proposals
+
+
+    def report(self, configuration_number, configuration_dict):
+
+        # returns the numbers of the configurations fed back as a result, in order
+        self.finished_configurations[configuration_number] = configuration_dict
+        fed_back = []
+        while self.completed_config_counter in self.finished_configurations:
+            configuration_number = self.completed_config_counter
+            configuration_dict = self.finished_configurations.pop(configuration_number)
+            del self.proposed_configurations[configuration_number]
+            self.feedback(configuration_dict)
+            fed_back.append(configuration_number)
+
+        return fed_back
+
+
+def _get_entry_points(group):
+    from importlib import metadata
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        return list(entry_points.select(group=group))
+    return list(entry_points.get(group, []))
+
+
+def get_search_algorithm_class(name):
+
+    # search algorithms are built in, registered by other packages under the
+    # "prose.search_algorithms" entry point group, or given as module:Class
+    from precimonious import PrecimoniousSearch
+    from bruteforce import BruteForceSearch
+    search_algorithms = {
+        "precimonious" : PrecimoniousSearch,
+        "bruteforce" : BruteForceSearch,
+    }
+    if name.lower() in search_algorithms:
+        return search_algorithms[name.lower()]
+
+    if sys.version_info >= (3, 8):
+        for entry_point in _get_entry_points("prose.search_algorithms"):
+            if entry_point.name == name:
+                return entry_point.load()
+
+    if ":" in name:
+        module_name, class_name = name.split(":")
+        return getattr(import_module(module_name), class_name)
+
+    raise Exception("[ERROR] Unknown search algorithm '{}'".format(name))
@@ -1,5 +1,6 @@
 import os
 import subprocess
+import tempfile
 from configparser import ConfigParser, ExtendedInterpolation
 
 
@@ -49,6 +50,19 @@ class SetupParser(object):
         else:
             self._data['machine']['src_search_paths'] = self._data['machine']['project_root']
 
+        # whether source files whose size or mtime changed since they were indexed are compared by content digest
+        # before being scanned again (prose_workspace/__project_index.json), e.g., after a checkout touched them
+        if 'index_digests' in self._data['machine']:
+            assert self._data['machine']['index_digests'].lower() in ['true', 'false'], "'index_digests' entry is a boolean; specify 'True' or 'False')"
+            self._data['machine']['index_digests'] = str(self._data['machine']['index_digests'].lower() == 'true').lower()
+        else:
+            self._data['machine']['index_digests'] = 'false'
+
+        # number of processes parsing the source files the reducer discovers at the same time, i.e., in the same wave
+        if 'parse_workers' not in self._data['machine']:
+            self._data['machine']['parse_workers'] = '1'
+        assert int(self._data['machine']['parse_workers']) > 0, "'parse_workers' entry in 'machine' section must be a positive integer"
+
         # process target section
         assert 'target' in self._data, "'target' section is missing in setup file"
         assert 'src_files' in self._data['target'], "'src_files' entry is missing in 'target' section of setup file"
@@ -100,6 +114,23 @@ class SetupParser(object):
         if not 'timeout' in self._data['run']:
             self._data['run']['timeout'] = '0'
 
+        # unless a timeout is given, model runs are killed once they take timeout_multiplier times the
+        # timeout_quantile of the runtimes of the baseline, which is run baseline_samples times, and of passing variants
+        if 'baseline_samples' not in self._data['run']:
+            self._data['run']['baseline_samples'] = '1'
+        assert int(self._data['run']['baseline_samples']) > 0, "'baseline_samples' entry in 'run' section must be a positive integer"
+        if 'timeout_multiplier' not in self._data['run']:
+            self._data['run']['timeout_multiplier'] = '3.0'
+        assert float(self._data['run']['timeout_multiplier']) > 0, "'timeout_multiplier' entry in 'run' section must be positive"
+        if 'timeout_quantile' not in self._data['run']:
+            self._data['run']['timeout_quantile'] = '1.0'
+        assert 0 < float(self._data['run']['timeout_quantile']) <= 1, "'timeout_quantile' entry in 'run' section must be in (0, 1]"
+
+        # model runs whose output does not grow for stall_timeout seconds are killed; 0 disables this
+        if 'stall_timeout' not in self._data['run']:
+            self._data['run']['stall_timeout'] = '0'
+        assert float(self._data['run']['stall_timeout']) >= 0, "'stall_timeout' entry in 'run' section must not be negative"
+
         # process eval section
         assert 'eval' in self._data, "'eval' section is missing in setup file"
         assert 'cmd' in self._data['eval'], "'cmd' entry is missing in 'eval' section of setup file"
@@ -112,6 +143,38 @@ class SetupParser(object):
         if 'cost_threshold' not in self._data['eval']:
             self._data['eval']['cost_threshold'] = "-1.0"
 
+        # process parallel section if present
+        if 'parallel' in self._data:
+            if 'cores_per_slot' not in self._data['parallel']:
+                self._data['parallel']['cores_per_slot'] = '1'
+            assert int(self._data['parallel']['cores_per_slot']) > 0, "'cores_per_slot' entry in 'parallel' section must be a positive integer"
+            if 'slots' not in self._data['parallel']:
+                self._data['parallel']['slots'] = str(max(1, len(os.sched_getaffinity(0)) // int(self._data['parallel']['cores_per_slot'])))
+            assert int(self._data['parallel']['slots']) > 0, "'slots' entry in 'parallel' section must be a positive integer"
+
+            # per-stage concurrency limits; the execute stage is bounded by the number of slots
+            for stage_name in ['apply_configuration', 'compile', 'evaluate']:
+                if '{}_workers'.format(stage_name) not in self._data['parallel']:
+                    self._data['parallel']['{}_workers'.format(stage_name)] = self._data['parallel']['slots']
+                assert int(self._data['parallel']['{}_workers'.format(stage_name)]) > 0, "'{}_workers' entry in 'parallel' section must be a positive integer".format(stage_name)
+            if 'max_in_flight' not in self._data['parallel']:
+                self._data['parallel']['max_in_flight'] = str(2 * int(self._data['parallel']['slots']))
+            assert int(self._data['parallel']['max_in_flight']) > 0, "'max_in_flight' entry in 'parallel' section must be a positive integer"
+            if 'sandbox_root' in self._data['parallel']:
+                self._data['parallel']['sandbox_root'] = os.path.abspath(self._data['parallel']['sandbox_root'])
+            else:
+                self._data['parallel']['sandbox_root'] = os.path.join(tempfile.gettempdir(), "prose_sandboxes")
+            if 'copy_ignore' in self._data['parallel']:
+                self._data['parallel']['copy_ignore'] = "|".join([name.strip() for name in self._data['parallel']['copy_ignore'].strip().split("\n")])
+            else:
+                self._data['parallel']['copy_ignore'] = ""
+            # build products that are hard linked into each build tree rather than copied; these must be
+            # replaced rather than rewritten in place by the build, e.g., by going through the compiler cache
+            if 'link_patterns' in self._data['parallel']:
+                self._data['parallel']['link_patterns'] = "|".join([pattern.strip() for pattern in self._data['parallel']['link_patterns'].strip().split("\n")])
+            else:
+                self._data['parallel']['link_patterns'] = ""
+
         # process Derecho section if present
         if 'Derecho' in self._data:
             assert 'env_script' in self._data['Derecho'], "'set_env' section is missing in the 'Derecho' section of setup file"
@@ -120,6 +183,38 @@ class SetupParser(object):
             else:
                 self._data['Derecho']['copy_ignore'] = ""
 
+        # process search section; the search algorithm is either built in, registered under the
+        # "prose.search_algorithms" entry point group, or given as module:Class
+        if 'search' not in self._data:
+            self._data['search'] = {}
+        if 'algorithm' not in self._data['search']:
+            self._data['search']['algorithm'] = 'precimonious'
+
+        # whether the timed steps of testing each configuration are exported as a Chrome trace (prose_logs/trace.json)
+        if 'trace' in self._data['search']:
+            assert self._data['search']['trace'].lower() in ['true', 'false'], "'trace' entry is a boolean; specify 'True' or 'False')"
+            self._data['search']['trace'] = str(self._data['search']['trace'].lower() == 'true').lower()
+        else:
+            self._data['search']['trace'] = 'false'
+
+        # process sandbox section; applies to the parallel and Derecho searches
+        if 'sandbox' not in self._data:
+            self._data['sandbox'] = {}
+        if 'mode' not in self._data['sandbox']:
+            self._data['sandbox']['mode'] = 'auto'
+        assert self._data['sandbox']['mode'] in ['auto', 'overlay', 'reflink', 'hardlink', 'copy'], "'mode' entry in 'sandbox' section must be one of 'auto', 'overlay', 'reflink', 'hardlink', or 'copy'"
+        if 'copy_patterns' in self._data['sandbox']:
+            self._data['sandbox']['copy_patterns'] = "|".join([pattern.strip() for pattern in self._data['sandbox']['copy_patterns'].strip().split("\n")])
+        else:
+            self._data['sandbox']['copy_patterns'] = ""
+
+        # process cache section if present
+        if 'cache' in self._data:
+            if 'path' in self._data['cache']:
+                self._data['cache']['path'] = os.path.abspath(os.path.expanduser(self._data['cache']['path']))
+            else:
+                self._data['cache']['path'] = os.path.join(os.path.expanduser("~"), ".cache", "prose")
+
 
     def _get_env(self, section):
         ''' Given a setup.ini section, runs the env_cmd and stores resulting environment in self.env'''
@@ -7,6 +7,7 @@ import subprocess
 import shutil
 from glob import glob
 from parsing import preprocess, find_valid_fortran_names
+from projectindex import PROJECT_INDEX_PATH, get_project_index, invalidate_project_indices
 
 FORTRAN_DECLARATION_MODIFIERS = [
     "real",
@@ -322,8 +323,9 @@ def old_preprocess(src_lines):
     return src_lines
 
 
-# if you provide multiple src paths, they should be in the order of dependence, if any
-def slice_program_and_build_graphs(target_src_paths, src_search_paths, additional_plugin_flags):
+# if you provide multiple src paths, they should be in the order of dependence, if any;
+# use_index_digests is the [machine] index_digests setting, as for the reducer
+def slice_program_and_build_graphs(target_src_paths, src_search_paths, additional_plugin_flags, use_index_digests=False):
 
     global FIXED_FORM_FORTRAN
 
@@ -334,6 +336,7 @@ def slice_program_and_build_graphs(target_src_paths, src_search_paths, additiona
             shell=True,
             executable="/bin/bash",
         )    
+    invalidate_project_indices(path=os.path.join(os.environ['PROSE_EXPERIMENT_DIR'], PROJECT_INDEX_PATH), use_digests=use_index_digests)
 
     target_src_paths = [os.path.relpath(x) for x in target_src_paths]
     upstream_src_paths = []
@@ -363,15 +366,11 @@ def slice_program_and_build_graphs(target_src_paths, src_search_paths, additiona
                 NAME_TO_SRC_PATH_MAP[module_name] = this_src_path
                 break
 
+        # a file without a module statement has no upstream src
+        if module_name == "":
+            continue
         for src_search_path in src_search_paths:
-            result = subprocess.run(
-                f"find {src_search_path} -type f -iname '*.f90' -o -type f -iname '*.f' | xargs -r -n 128 -P 16 grep -lirE '^\s*use\s+{module_name}(,|\s+|$)'",
-                shell=True,
-                stdout=subprocess.PIPE,
-                text=True,
-                executable="/bin/bash",
-            )
-            upstream_src_paths = list(set(upstream_src_paths + [os.path.relpath(x) for x in result.stdout.split("\n") if x]))
+            upstream_src_paths = list(set(upstream_src_paths + [os.path.relpath(x) for x in get_project_index(src_search_path).find_module_uses(module_name)]))
 
     src_queue = list(set(deepcopy(upstream_src_paths) + deepcopy(target_src_paths)))
     i = -1
@@ -427,14 +426,7 @@ def slice_program_and_build_graphs(target_src_paths, src_search_paths, additiona
                     unique_found = False
                     multiple_found = []
                     for src_search_path in src_search_paths:
-                        result = subprocess.run(
-                            f"find {src_search_path} -type f -iname '*.f90' -o -type f -iname '*.f' | xargs -r -n 128 -P 16 grep -lirE '^\s*module\s+{module_name}(\s+|$)'",
-                            shell=True,
-                            stdout=subprocess.PIPE,
-                            text=True,
-                            executable="/bin/bash",
-                        )
-                        grep_results = [x for x in result.stdout.split("\n") if x]
+                        grep_results = get_project_index(src_search_path).find_module_definitions(module_name)
                         if len(grep_results) == 1:
                             unique_found = True
                             depend_src_path = os.path.relpath(grep_results[0])
@@ -496,24 +488,7 @@ def slice_program_and_build_graphs(target_src_paths, src_search_paths, additiona
                     unique_found = False
                     multiple_found = []
                     for src_search_path in src_search_paths:
-                        if "/" not in include_file_name:
-                            result = subprocess.run(
-                                f"find {src_search_path} -type f -iname '{include_file_name}'",
-                                shell=True,
-                                stdout=subprocess.PIPE,
-                                text=True,
-                                executable="/bin/bash",
-                            )
-                        else:
-                            result = subprocess.run(
-                                f"find {src_search_path} -type f -wholename '{include_file_name}'",
-                                shell=True,
-                                stdout=subprocess.PIPE,
-                                text=True,
-                                executable="/bin/bash",
-                            )
-
-                        find_results = [x for x in result.stdout.split("\n") if x]
+                        find_results = get_project_index(src_search_path).find_files(include_file_name)
                         if len(find_results) == 1:
                             unique_found = True
                             depend_src_path = os.path.relpath(find_results[0])
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import tempfile
+from datetime import timedelta
+from resultslog import RESULTS_LOG_PATH, get_cost
+
+STATUS_PATH = "prose_logs/status.json"
+STAGE_NAMES = ["apply_configuration", "compile", "execute", "evaluate"]
+
+
+class SearchStatus:
+    '''
+    Running summary of a search, folded in from the records appended to the results log since the last
+    update and rewritten to a small file, so that checking on a long search never rescans the experiment
+    '''
+
+    def __init__(self, results_log_path=RESULTS_LOG_PATH, status_path=STATUS_PATH):
+        self.results_log_path = results_log_path
+        self.status_path = status_path
+        self.offset = 0
+
+        # throughput and stage occupancy only count variants tested since the search was (re)started
+        self.start_time = time.time()
+        self.num_session_variants = 0
+        self.stage_seconds = {stage_name : 0.0 for stage_name in STAGE_NAMES}
+
+        self.labels = {}
+        self.costs = {}
+        self.label_counts = {}
+        self.original_cost = None
+        self.best_passed = None
+        self.best_failed = None
+        self.last_message = None
+
+
+    def update(self, num_remaining=None):
+
+        # num_remaining is the number of variants the search algorithm still has to test, if it knows it
+        self._read_new_records()
+        self._write(num_remaining)
+
+
+    def _read_new_records(self):
+
+        if not os.path.exists(self.results_log_path):
+            return
+
+        with open(self.results_log_path, "rb") as f:
+            f.seek(self.offset)
+            for line in f:
+
+                # a record still being written is picked up by the next update
+                if not line.endswith(b"\n"):
+                    break
+                self.offset += len(line)
+
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record["record"] == "variant":
+                    self._add_variant(record)
+
+
+    def _add_variant(self, record):
+
+        # a configuration tested again, e.g., after resuming, is counted once, with its last label and cost
+        configuration_number = record["configuration_number"]
+        relogged = configuration_number in self.labels
+        if relogged:
+            self.label_counts[self.labels[configuration_number]] -= 1
+        self.labels[configuration_number] = record["label"]
+        self.costs[configuration_number] = get_cost(record)
+        self.label_counts[record["label"]] = self.label_counts.get(record["label"], 0) + 1
+        self.last_message = record["message"]
+
+        # the configuration may have been the best one so far, so the best ones are taken from all configurations again
+        if relogged:
+            self.original_cost = None
+            self.best_passed = None
+            self.best_failed = None
+            for number in sorted(self.costs):
+                self._update_best(number)
+        else:
+            self._update_best(configuration_number)
+
+        if record["time"] >= self.start_time:
+            self.num_session_variants += 1
+            for stage_name, seconds in record["stages"].items():
+                self.stage_seconds[stage_name] = self.stage_seconds.get(stage_name, 0.0) + seconds
+
+
+    def _update_best(self, configuration_number):
+
+        cost = self.costs[configuration_number]
+        if cost is not None and self.labels[configuration_number] == "PASSED":
+            if configuration_number == 0:
+                self.original_cost = cost
+            if self.best_passed is None or cost < self.best_passed[1]:
+                self.best_passed = (configuration_number, cost)
+        elif cost is not None and self.labels[configuration_number] == "FAILED":
+            if self.best_failed is None or cost < self.best_failed[1]:
+                self.best_failed = (configuration_number, cost)
+
+
+    def _write(self, num_remaining):
+
+        # occupancy is the mean number of variants in a stage at any time since the search was (re)started
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        variants_per_hour = self.num_session_variants / elapsed * 3600
+        status = {
+            "time" : time.time(),
+            "elapsed" : elapsed,
+            "num_variants" : len(self.labels),
+            "labels" : {label : count for label, count in sorted(self.label_counts.items()) if count > 0},
+            "original_cost" : self.original_cost,
+            "best_passed" : self.best_passed,
+            "best_failed" : self.best_failed,
+            "variants_per_hour" : variants_per_hour,
+            "stage_occupancy" : {stage_name : seconds / elapsed for stage_name, seconds in self.stage_seconds.items()},
+            "num_remaining" : num_remaining,
+            "eta" : num_remaining / variants_per_hour * 3600 if num_remaining is not None and variants_per_hour > 0 else None,
+            "last_message" : self.last_message,
+        }
+
+        # readers never observe a partially written status
+        fd, staging_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.status_path)))
+        with os.fdopen(fd, "w") as f:
+            json.dump(status, f, indent=1)
+        os.replace(staging_path, self.status_path)
+
+
+def format_status(status_path=STATUS_PATH):
+
+    with open(status_path, "r") as f:
+        status = json.load(f)
+
+    def format_best(best):
+        if best is None:
+            return "none"
+        configuration_number, cost = best
+        speedup = status["original_cost"] / cost if status["original_cost"] else float("nan")
+        return "{:0>4}, cost = {:.3f} ({:.3f}x speedup)".format(configuration_number, cost, speedup)
+
+    lines = []
+    lines.append("   Last update: {} ago".format(timedelta(seconds=int(time.time() - status["time"]))))
+    lines.append("      Variants: {} ({})".format(status["num_variants"], ", ".join(["{} {}".format(count, label) for label, count in status["labels"].items()])))
+    if status["last_message"]:
+        lines.append("  Last variant: {}".format(status["last_message"]))
+    if status["original_cost"] is not None:
+        lines.append(" Original cost = {:.3f}".format(status["original_cost"]))
+    lines.append("   Best FAILED: {}".format(format_best(status["best_failed"])))
+    lines.append("   Best PASSED: {}".format(format_best(status["best_passed"])))
+    lines.append("    Throughput: {:.1f} variants/hour over {}".format(status["variants_per_hour"], timedelta(seconds=int(status["elapsed"]))))
+    lines.append("     Occupancy: {}".format(", ".join(["{} {:.2f}".format(stage_name, occupancy) for stage_name, occupancy in status["stage_occupancy"].items()])))
+    if status["eta"] is not None:
+        lines.append("           ETA: {} for {} remaining variants".format(timedelta(seconds=int(status["eta"])), status["num_remaining"]))
+    return "\n".join(lines)
@@ -0,0 +1,128 @@
+import os
+import json
+import pickle
+import sqlite3
+
+STORE_PATH = "prose_workspace/__prose.db"
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS static (
+    name TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS search_state (
+    name TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS variants (
+    configuration_number INTEGER PRIMARY KEY,
+    configuration TEXT NOT NULL,
+    total_cost REAL,
+    targeted_subset_cost REAL
+);
+'''
+
+_stores = {}
+
+
+def get_store(path=STORE_PATH):
+
+    # one store per database and process; connections are never shared with forked variant processes
+    key = (os.path.abspath(path), os.getpid())
+    if key not in _stores:
+        _stores[key] = ProseStore(path)
+    return _stores[key]
+
+
+class ProseStore:
+    '''
+    SQLite database of an experiment: static analysis results, which are written once the analysis is done,
+    search state, which is overwritten as the search advances, and the outcome of each variant, one row each
+    '''
+
+    def __init__(self, path=STORE_PATH):
+        self.path = os.path.abspath(path)
+        self._connection = None
+
+
+    def _connect(self):
+
+        # the database is created on first use, and again if prose_workspace was wiped by a new experiment
+        if self._connection is not None and not os.path.exists(self.path):
+            self._connection.close()
+            self._connection = None
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+
+    def exists(self):
+
+        # whether static analysis results were saved, i.e., whether there is anything to resume from
+        if not os.path.exists(self.path):
+            return False
+        return self._connect().execute("SELECT COUNT(*) FROM static").fetchone()[0] > 0
+
+
+    def put_static(self, items, unchanged_names=()):
+
+        # entries named in unchanged_names are kept as they are, all others are replaced by items
+        kept_names = list(unchanged_names)
+        with self._connect() as connection:
+            connection.execute("DELETE FROM static WHERE name NOT IN ({})".format(",".join("?" * len(kept_names))), kept_names)
+            connection.executemany("INSERT OR REPLACE INTO static VALUES (?, ?)", [(name, pickle.dumps(value)) for name, value in items.items()])
+
+
+    def get_static_names(self):
+        return [name for name, in self._connect().execute("SELECT name FROM static").fetchall()]
+
+
+    def get_static(self, names=None):
+
+        # only the given entries are unpickled if names are given
+        if names is None:
+            rows = self._connect().execute("SELECT name, value FROM static").fetchall()
+        else:
+            names = list(names)
+            rows = self._connect().execute("SELECT name, value FROM static WHERE name IN ({})".format(",".join("?" * len(names))), names).fetchall()
+        return {name : pickle.loads(value) for name, value in rows}
+
+
+    def put_search_state(self, items, variant=None):
+
+        # variant is a (configuration number, configuration, total cost, targeted subset cost) tuple recorded in
+        # the same transaction, so that the search state and the outcomes of variants never disagree
+        with self._connect() as connection:
+            connection.executemany("INSERT OR REPLACE INTO search_state VALUES (?, ?)", [(name, pickle.dumps(value)) for name, value in items.items()])
+            if variant is not None:
+                configuration_number, configuration_dict, total_cost, targeted_subset_cost = variant
+                connection.execute(
+                    "INSERT OR REPLACE INTO variants VALUES (?, ?, ?, ?)",
+                    (configuration_number, json.dumps(configuration_dict), float(total_cost), float(targeted_subset_cost)),
+                )
+
+
+    def has_search_state(self, name):
+        if not os.path.exists(self.path):
+            return False
+        return self._connect().execute("SELECT COUNT(*) FROM search_state WHERE name = ?", (name,)).fetchone()[0] > 0
+
+
+    def get_search_state(self, names=None):
+        if names is None:
+            rows = self._connect().execute("SELECT name, value FROM search_state").fetchall()
+        else:
+            names = list(names)
+            rows = self._connect().execute("SELECT name, value FROM search_state WHERE name IN ({})".format(",".join("?" * len(names))), names).fetchall()
+        return {name : pickle.loads(value) for name, value in rows}
+
+
+    def get_variants(self):
+
+        # returns {configuration number : (configuration, total cost, targeted subset cost)}
+        rows = self._connect().execute("SELECT configuration_number, configuration, total_cost, targeted_subset_cost FROM variants ORDER BY configuration_number").fetchall()
+        return {configuration_number : (json.loads(configuration), total_cost, targeted_subset_cost) for configuration_number, configuration, total_cost, targeted_subset_cost in rows}
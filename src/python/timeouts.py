@@ -0,0 +1,120 @@
+import os
+import time
+import signal
+import subprocess
+import numpy as np
+
+# how often a running model is checked for its deadline and for progress, in seconds
+POLL_INTERVAL = 1.0
+
+
+class StalledRun(subprocess.SubprocessError):
+    '''
+    Raised when a model run stops writing to its log for longer than the stall timeout
+    '''
+
+    def __init__(self, cmd, stall_timeout):
+        self.cmd = cmd
+        self.stall_timeout = stall_timeout
+
+    def __str__(self):
+        return "Command '{}' wrote no output for {} seconds".format(self.cmd, self.stall_timeout)
+
+
+class TimeoutPolicy:
+    '''
+    Deadlines for the model runs of variants, derived from the runtimes of the baseline,
+    which may be sampled several times, and of the variants that passed so far
+    '''
+
+    def __init__(self, fixed_timeout=0, multiplier=3.0, quantile=1.0, stall_timeout=0):
+
+        # a fixed timeout, i.e., one given in the setup file, overrides anything observed
+        self.fixed_timeout = fixed_timeout
+        self.multiplier = multiplier
+        self.quantile = quantile
+        self.stall_timeout = stall_timeout
+
+        self.baseline_cost = None
+        self.runtimes = []
+
+
+    @staticmethod
+    def from_setup(SETUP):
+        return TimeoutPolicy(
+            fixed_timeout=float(SETUP['run']['timeout']),
+            multiplier=float(SETUP['run']['timeout_multiplier']),
+            quantile=float(SETUP['run']['timeout_quantile']),
+            stall_timeout=float(SETUP['run']['stall_timeout']),
+        )
+
+
+    def observe(self, runtimes):
+
+        # runtimes of the model runs of a passing variant
+        self.runtimes += runtimes
+
+
+    def get_timeout(self):
+
+        # without any runtime observed, e.g., if the baseline result came from the cache,
+        # the cost of the baseline stands in for its runtime; raises OverflowError if the baseline failed
+        if self.fixed_timeout > 0:
+            return int(self.fixed_timeout)
+        elif self.runtimes:
+            return int(np.ceil(self.multiplier * np.quantile(self.runtimes, self.quantile)))
+        else:
+            return int(np.ceil(self.multiplier * self.baseline_cost))
+
+
+    def run(self, command, outfile, cwd, env, timeout=None):
+
+        # runs a model to completion and returns its runtime; the run gets a session of its own so that it
+        # is killed along with every process it spawned, be it on a timeout, a stall, or any exception
+        # raised in the meantime, e.g., when its variant is cancelled
+        start = time.time()
+        process = subprocess.Popen(
+            command,
+            cwd=cwd,
+            env=env,
+            stdout=outfile,
+            stderr=outfile,
+            shell=True,
+            executable="/bin/bash",
+            start_new_session=True,
+        )
+
+        try:
+            log_size = -1
+            last_progress = start
+            while True:
+                try:
+                    process.wait(timeout=POLL_INTERVAL)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
+
+                now = time.time()
+                if timeout and now - start > timeout:
+                    raise subprocess.TimeoutExpired(command, timeout)
+
+                # the run makes progress as long as its log keeps growing
+                if self.stall_timeout > 0:
+                    if os.fstat(outfile.fileno()).st_size != log_size:
+                        log_size = os.fstat(outfile.fileno()).st_size
+                        last_progress = now
+                    elif now - last_progress > self.stall_timeout:
+                        raise StalledRun(command, self.stall_timeout)
+
+        finally:
+            if process.poll() is None:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                process.wait()
+
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, command)
+
+        return time.time() - start
@@ -2,6 +2,8 @@ import os
 import sys
 import subprocess
 import time
+import queue
+import signal
 import pickle
 import shutil
 import re
@@ -11,32 +13,72 @@ from datetime import timedelta
 from setupparser import SetupParser
 from copy import deepcopy
 from gvar import VariableInteractionGraph
+from graphfile import load_graph
+from callgraph import CallGraph, get_strongly_connected_components
+from cache import ResultCache, SourceCache, digest_configuration
+from resultslog import RESULTS_LOG_PATH, append_record, get_variants, get_cost
+from status import STATUS_PATH, STAGE_NAMES, SearchStatus
+from instrumentation import Instrumentation, TRACE_EVENTS_PATH, TRACE_PATH, export_chrome_trace, merge_histograms
+from store import STORE_PATH, get_store
+from projectindex import PROJECT_INDEX_PATH, invalidate_project_indices
+from sandbox import Sandbox
+from timeouts import TimeoutPolicy, StalledRun
+from rebuild import RebuildDriver, scan_module_dependencies, write_if_changed
 from gptlparser import gptl_parse_subset
 from slicer import unslice
 from reducer import reduce
 from glob import glob
+from contextlib import contextmanager
 
 assert sys.version_info >= (3, 7), "Python version must be at least 3.7"
 
+class ConfigurationCancelled(Exception):
+    '''
+    Raised in a variant process whose configuration was cancelled by the search algorithm
+    '''
+    pass
+
+
 class ProseProjectTransformer:
 
+    # attributes that change as the search advances, saved after every variant;
+    # all others are static analysis results, saved once they are complete
+    SEARCH_STATE_ATTRIBUTES = ["last_completed_configuration_number", "timeout", "_timeout_policy", "predicted_original_cost"]
+
+    # attributes rebuilt on demand, which are never saved
+    TRANSIENT_ATTRIBUTES = ["_static_store_path", "_unloaded_static_names", "_result_cache", "_source_cache", "_interface_vars", "_interface_files", "_module_dependencies", "_instrumentation", "_search_status"]
+
     @staticmethod
-    def load(path_to_transformer,resume=False):
+    def load(path_to_transformer=STORE_PATH,resume=False):
 
         os.environ["PROSE_EXPERIMENT_DIR"] = os.getcwd()
         os.environ["PROSE_REPO_PATH"] = os.path.realpath(os.path.dirname(os.path.realpath(__file__)) + "/..")
 
-        if "Derecho" in os.path.basename(path_to_transformer):
+        # transformers of experiments started before the store existed were pickled as a whole
+        if "Derecho" in os.path.basename(path_to_transformer) and path_to_transformer.endswith(".pckl"):
             transformer = DerechoProseProjectTransformer._load(path_to_transformer)
-        else:
+        elif path_to_transformer.endswith(".pckl"):
             with open(path_to_transformer, "rb") as f:
                 transformer = pickle.load(f)
+        else:
+            store = get_store(path_to_transformer)
+            if not store.exists():
+                raise FileNotFoundError("[ERROR] No saved experiment found in {}".format(path_to_transformer))
+
+            # static analysis results are only unpickled once they are used, see __getattr__
+            transformer_class = store.get_static(["__class__"])["__class__"]
+            transformer = transformer_class.__new__(transformer_class)
+            transformer._static_store_path = store.path
+            transformer._unloaded_static_names = set(store.get_static_names()) - set(["__class__"])
+            transformer.__dict__.update(store.get_search_state(transformer_class.SEARCH_STATE_ATTRIBUTES))
 
         # if resuming, remove any directories of configurations that were not completely evaluated and reset
         if resume:
             for configuration_number in [int(dirname) for dirname in os.listdir(os.path.join(transformer.PROSE_EXPERIMENT_DIR, "prose_logs")) if dirname.isnumeric()]:
                 if configuration_number > transformer.last_completed_configuration_number:
                     shutil.rmtree(os.path.join(transformer.PROSE_EXPERIMENT_DIR, "prose_logs/{:0>4}".format(configuration_number)))
+            transformer._result_cache = None
+            transformer._source_cache = None
             transformer.reset_project()
 
         return transformer
@@ -45,8 +87,12 @@ class ProseProjectTransformer:
     def __new__(cls, *args, **kwargs):
         
         try:
-            if cls != DerechoProseProjectTransformer and "Derecho" in SetupParser(args[0], working_dir=os.getcwd())._data:
-                return DerechoProseProjectTransformer(args[0])
+            if cls == ProseProjectTransformer:
+                setup_data = SetupParser(args[0], working_dir=os.getcwd())._data
+                if "Derecho" in setup_data:
+                    return DerechoProseProjectTransformer(args[0])
+                elif "parallel" in setup_data:
+                    return LocalProseProjectTransformer(args[0])
         except IndexError:
             pass
 
@@ -67,6 +113,7 @@ class ProseProjectTransformer:
         self.search_space = {}
         self.last_completed_configuration_number = -1
         self.timeout = -1
+        self.predicted_original_cost = None
 
         try:
             self.ROSE_EXE_PATH = os.environ["ROSE_EXE_PATH"]
@@ -78,28 +125,71 @@ class ProseProjectTransformer:
         try:
             if os.path.exists("prose_logs"):
                 shutil.rmtree("prose_logs")
+
+            # the project index is only a cache of what is in the source files, so it outlives the experiment
+            saved_project_index = None
+            if os.path.exists(PROJECT_INDEX_PATH):
+                with open(PROJECT_INDEX_PATH, "rb") as f:
+                    saved_project_index = f.read()
             if os.path.exists("prose_workspace"):
                 shutil.rmtree("prose_workspace")
             os.makedirs("prose_logs")
             os.makedirs("prose_workspace")
-            os.makedirs("prose_workspace/__search_progress")
+            os.makedirs("prose_workspace/__runtimes")
             os.makedirs("prose_workspace/original_files")
             os.makedirs("prose_workspace/__profiling")
             os.makedirs("prose_workspace/__source_data")
-            os.makedirs("prose_workspace/__timers")
-            os.makedirs("prose_workspace/__timers/apply_configuration")
-            os.makedirs("prose_workspace/__timers/compile")
-            os.makedirs("prose_workspace/__timers/execute")
-            os.makedirs("prose_workspace/__timers/evaluate")
             os.makedirs("prose_workspace/rmod_files")
+            if saved_project_index is not None:
+                with open(PROJECT_INDEX_PATH, "wb") as f:
+                    f.write(saved_project_index)
 
         except:
             raise Exception("[ERROR] Failed to create required directories.")
 
 
-    def _save(self):
-        with open(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_workspace/__ProseProjectTransformer.pckl"), "wb") as f:
-            pickle.dump(self, f)
+    def __getattr__(self, name):
+
+        # only called for attributes that are not set, e.g., static analysis results of a loaded transformer not used so far
+        unloaded_static_names = self.__dict__.get("_unloaded_static_names", set())
+        if name not in unloaded_static_names:
+            raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, name))
+        self.__dict__[name] = get_store(self._static_store_path).get_static([name])[name]
+        unloaded_static_names.discard(name)
+        return self.__dict__[name]
+
+
+    def __getstate__(self):
+        return self.__dict__.copy()
+
+
+    def _save(self, search_algorithm=None):
+
+        # saves the static analysis results along with the search state; while searching,
+        # only the search state changes, which _save_search_state saves on its own
+        # static analysis results that were never unpickled are left as they are, unless saved to another store
+        store = get_store(os.path.join(self.PROSE_EXPERIMENT_DIR, STORE_PATH))
+        if store.path != self.__dict__.get("_static_store_path"):
+            for name in list(self.__dict__.get("_unloaded_static_names", [])):
+                getattr(self, name)
+        unchanged_names = set(self.__dict__.get("_unloaded_static_names", []))
+        state = self.__getstate__()
+        for name in self.TRANSIENT_ATTRIBUTES + self.SEARCH_STATE_ATTRIBUTES:
+            state.pop(name, None)
+        state["__class__"] = type(self)
+
+        store.put_static(state, unchanged_names)
+        self._save_search_state(search_algorithm)
+
+
+    def _save_search_state(self, search_algorithm=None, variant=None):
+
+        # the search algorithm, if given, is checkpointed and variant, i.e., the (configuration number, configuration,
+        # total cost, targeted subset cost) of a variant, recorded in the same transaction as the search state
+        items = {name : getattr(self, name) for name in self.SEARCH_STATE_ATTRIBUTES if hasattr(self, name)}
+        if search_algorithm is not None:
+            items[type(search_algorithm).__name__] = search_algorithm
+        get_store(os.path.join(self.PROSE_EXPERIMENT_DIR, STORE_PATH)).put_search_state(items, variant)
 
 
     def preliminary_analysis(self):
@@ -155,7 +245,7 @@ class ProseProjectTransformer:
         subprocess.run(
             self.SETUP['build']['cmd'],
             check=True,
-            env=os.environ.copy(),
+            env=self._get_build_env(self.PROSE_EXPERIMENT_DIR),
             cwd=self.SETUP['build']['working_dir'],
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
@@ -172,36 +262,64 @@ class ProseProjectTransformer:
         if float(self.SETUP['eval']['cost_threshold']) > 0:
             search_algorithm.set_cost_threshold(float(self.SETUP['eval']['cost_threshold']))
 
-        configuration_number = search_algorithm.completed_config_counter
-        configuration_dict = search_algorithm.get_next()
-        while configuration_dict:
-            total_cost, targeted_subset_cost = self._test_configuration(configuration_dict=configuration_dict, configuration_number=configuration_number)
-            if targeted_subset_cost != 0:
-                cost = targeted_subset_cost
-            else:
-                cost = total_cost
+        # digest the search context once up front rather than in every variant
+        self._get_result_cache()
+        self._get_source_cache()
+        self._get_module_dependencies()
+        self._get_search_status().update()
 
-            configuration_dict["cost"] = cost
-            if self.timeout < 0:
-                if self.SETUP['run']['timeout'] == '0':
-                    self.timeout = int(np.ceil(total_cost * 3.0))
-                else:
-                    self.timeout = int(float(self.SETUP['run']['timeout']))
+        # the static analysis results are complete by now; from here on, only the search state changes
+        self._save(search_algorithm)
 
-            search_algorithm.feedback(configuration_dict)
-            self.last_completed_configuration_number = configuration_number            
-            self._save()
-            
-            configuration_dict = search_algorithm.get_next()
-            configuration_number += 1
+        proposals = search_algorithm.propose(1)
+        while proposals:
+            predicted_cost_ratios = self._predict_cost_ratios([configuration_dict for _, configuration_dict in proposals])
+            for (configuration_number, configuration_dict), predicted_cost_ratio in zip(proposals, predicted_cost_ratios):
+                cost = self._test_configuration(configuration_dict=configuration_dict, configuration_number=configuration_number, predicted_cost_ratio=predicted_cost_ratio)
+                self._report_result(search_algorithm, configuration_number, configuration_dict, cost)
+            proposals = search_algorithm.propose(1)
 
         with open(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_logs/timers.txt"), "a") as f:
             f.write("{} search\n".format(timedelta(seconds=time.time()-start)))
 
-        self._save()
+        self._save(search_algorithm)
         self.report(final=True)
 
 
+    def _report_result(self, search_algorithm, configuration_number, configuration_dict, cost):
+
+        total_cost, targeted_subset_cost = cost
+
+        # the runtimes of passing variants, and of the baseline, set the deadline of the model runs still to come
+        timeout_policy = self._get_timeout_policy()
+        if np.isfinite(total_cost) and total_cost > 0:
+            timeout_policy.observe(self._get_runtimes(configuration_number))
+
+        if self.timeout < 0: # should only happen on the default (first) configuration
+            timeout_policy.baseline_cost = total_cost
+            try:
+                self.timeout = timeout_policy.get_timeout()
+            except OverflowError:
+                print("Default configuration appears to have failed; exiting.")
+                exit(1)
+        else:
+            self.timeout = timeout_policy.get_timeout()
+
+        # take subset cost if present; otherwise, take total cost
+        if targeted_subset_cost != 0:
+            configuration_dict["cost"] = targeted_subset_cost
+        else:
+            configuration_dict["cost"] = total_cost
+
+        # results are fed back to the search algorithm in the order the configurations were proposed
+        fed_back = search_algorithm.report(configuration_number, configuration_dict)
+        if fed_back:
+            self.last_completed_configuration_number = fed_back[-1]
+        self._save_search_state(search_algorithm, variant=(configuration_number, configuration_dict, total_cost, targeted_subset_cost))
+
+        self._get_search_status().update(search_algorithm.get_num_remaining())
+
+
     def test_configuration(self, configuration_file_path, path_to_setup_file=None, node_name=""):
 
         if path_to_setup_file:
@@ -218,6 +336,7 @@ class ProseProjectTransformer:
             pass
 
         print("\n============ Testing Configuration ============\n")
+        self._instrumentation = Instrumentation()
 
         working_dir = self.PROSE_EXPERIMENT_DIR
         configuration_dir = os.path.dirname(configuration_file_path)
@@ -262,7 +381,20 @@ class ProseProjectTransformer:
         self.reset_project()
 
 
-    def _test_configuration(self, configuration_dict, configuration_number, working_dir=".", node_name=""):
+    def _predict_cost_ratios(self, configuration_dicts):
+
+        # configurations proposed together are scored by the cost model in one go, before any of them is tested;
+        # the first configuration scored is taken as the original one, so its predicted cost is search state
+        if self.SETUP['run']['execution_filtering'].lower() == "true":
+            self.G_var.original_cost = getattr(self, "predicted_original_cost", None)
+            predicted_cost_ratios = list(self.G_var.get_cost_ratios(configuration_dicts))
+            self.predicted_original_cost = self.G_var.original_cost
+            return predicted_cost_ratios
+        else:
+            return [1] * len(configuration_dicts)
+
+
+    def _test_configuration(self, configuration_dict, configuration_number, working_dir=".", node_name="", predicted_cost_ratio=None):
 
         print("\n============ Testing Configuration {} ============\n".format(configuration_number))
         
@@ -270,6 +402,10 @@ class ProseProjectTransformer:
         configuration_number = "{}".format(configuration_number)
         os.makedirs(configuration_dir)
         
+        # runtimes left behind by an interrupted test of the same configuration
+        if os.path.exists(self._get_runtimes_path(configuration_number)):
+            os.remove(self._get_runtimes_path(configuration_number))
+
         # write out the configuration to be read in by the ROSE plugin
         with open(os.path.join(configuration_dir, "config"), "w") as f:
             for var_name, varKind in configuration_dict["config"].items():
@@ -277,22 +413,32 @@ class ProseProjectTransformer:
 
         total_cost = -1
         targeted_subset_cost = -1
+        measured_cost = None
+        self._instrumentation = Instrumentation(trace_tid=int(configuration_number))
         
-        if self.SETUP['run']['execution_filtering'].lower() == "true":
-            predicted_cost_ratio = self.G_var.get_cost_ratio(configuration_dict)
-        else:
-            predicted_cost_ratio = 1
+        if predicted_cost_ratio is None:
+            predicted_cost_ratio = self._predict_cost_ratios([configuration_dict])[0]
+
+        # variants that were already tested, e.g., by an earlier or interrupted search, are not tested again
+        cached_result = None
+        if predicted_cost_ratio >= 1:
+            cached_result = self._get_cached_result(configuration_dict, configuration_dir)
 
         if predicted_cost_ratio < 1: 
             message = "{:0>4}: [FAILED] (cost model) predicted cost ratio = {}".format(configuration_number, predicted_cost_ratio)
             os.rename(os.path.join(configuration_dir, "config"), os.path.join(configuration_dir, "config_FAILED"))
             total_cost = np.inf
             targeted_subset_cost = np.inf
+        elif cached_result:
+            message = "{:0>4}: {} (cached)".format(configuration_number, cached_result["message"])
+            os.rename(os.path.join(configuration_dir, "config"), os.path.join(configuration_dir, "config_{}".format(cached_result["label"])))
+            total_cost = cached_result["total_cost"]
+            targeted_subset_cost = cached_result["targeted_subset_cost"]
+            measured_cost = cached_result.get("cost")
         else:
 
-            start = time.time()
-            flag = self._apply_configuration(working_dir, configuration_dir, node_name)
-            os.mknod(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_workspace/__timers/apply_configuration/{:0>4}_{}".format(configuration_number, time.time()-start)))
+            with self._stage("apply_configuration", configuration_number):
+                flag = self._apply_configuration(working_dir, configuration_dir, node_name)
 
             if flag < 0:
                 message = "{:0>4}: [INVALID] (plugin error) unable to apply transformations to source code".format(configuration_number)
@@ -301,9 +447,8 @@ class ProseProjectTransformer:
                 targeted_subset_cost = np.inf
             else:
 
-                start = time.time()
-                flag = self._compile(working_dir, configuration_dir, node_name)
-                os.mknod(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_workspace/__timers/compile/{:0>4}_{}".format(configuration_number, time.time()-start)))
+                with self._stage("compile", configuration_number):
+                    flag = self._compile(working_dir, configuration_dir, node_name)
 
                 if flag < 0:
                     message = "{:0>4}: [INVALID] (compilation error) unable to compile transformed source code".format(configuration_number)
@@ -312,9 +457,12 @@ class ProseProjectTransformer:
                     targeted_subset_cost = np.inf
                 else:
 
-                    start = time.time()
-                    exception = self._execute(working_dir, configuration_dir, node_name)
-                    os.mknod(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_workspace/__timers/execute/{:0>4}_{}".format(configuration_number, time.time()-start)))
+                    # the baseline may be run several times to get a better idea of its runtime
+                    with self._stage("execute", configuration_number):
+                        for _ in range(int(self.SETUP['run']['baseline_samples']) if configuration_number == "0" else 1):
+                            exception = self._execute(working_dir, configuration_dir, node_name)
+                            if exception:
+                                break
 
                     if exception:
                         total_cost = np.inf
@@ -322,15 +470,16 @@ class ProseProjectTransformer:
                         if isinstance(exception, subprocess.TimeoutExpired):
                             message = "{:0>4}: [FAILED] (timeout) timeout {} exceeded".format(configuration_number, self.timeout)
                             os.rename(os.path.join(configuration_dir, "config"), os.path.join(configuration_dir, "config_FAILED"))
+                        elif isinstance(exception, StalledRun):
+                            message = "{:0>4}: [FAILED] (stalled) no output for {} seconds".format(configuration_number, exception.stall_timeout)
+                            os.rename(os.path.join(configuration_dir, "config"), os.path.join(configuration_dir, "config_FAILED"))
                         else:
                             message = "{:0>4}: [FAILED] (runtime failure) unable to execute transformed source code (see outlog.txt for details)".format(configuration_number)
                             os.rename(os.path.join(configuration_dir, "config"), os.path.join(configuration_dir, "config_FAILED"))
                     else:
 
-                        start = time.time()  
-                        total_cost, targeted_subset_cost = self._evaluate(working_dir, configuration_dir)
-
-                        os.mknod(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_workspace/__timers/evaluate/{:0>4}_{}".format(configuration_number, time.time()-start)))
+                        with self._stage("evaluate", configuration_number):
+                            total_cost, targeted_subset_cost = self._evaluate(working_dir, configuration_dir)
 
                         # if _evaluate returned 0, it is because it couldn't cast the return from the eval command
                         # as a float which we assume means that the program failed gracefully but failed nonetheless, e.g., returning NaN
@@ -354,6 +503,7 @@ class ProseProjectTransformer:
                                 cost = total_cost
 
                             os.mknod(os.path.join(configuration_dir, f"COST_{np.abs(cost)}"))
+                            measured_cost = float(np.abs(cost))
     
                             if cost > 0:
                                 if targeted_subset_cost != 0:
@@ -370,48 +520,274 @@ class ProseProjectTransformer:
                                 total_cost = np.inf
                                 targeted_subset_cost = np.inf
 
+            self._cache_result(configuration_dict, configuration_dir, total_cost, targeted_subset_cost, message, measured_cost)
+
         # there has to be something wrong with our transformer if the first config is already invalid.
         if configuration_number == 0:
             assert(total_cost > 0)
 
         print("\t **{}".format(message[message.find(":") + 1:]))
-        with open(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_workspace/__search_progress/{:0>4}".format(configuration_number)), "w") as f:
-            f.write("{}\n".format(message))
+        self._log_variant(configuration_dict, configuration_number, message, total_cost, targeted_subset_cost, measured_cost,
+                          predicted_cost_ratio=predicted_cost_ratio, cached=bool(cached_result))
 
         self.reset_project()
 
         return total_cost, targeted_subset_cost
 
 
+    def _get_result_cache(self):
+
+        if 'cache' not in self.SETUP._data:
+            return None
+        if getattr(self, "_result_cache", None) is None:
+            self._result_cache = ResultCache.from_transformer(self)
+        return self._result_cache
+
+
+    def _get_cached_result(self, configuration_dict, configuration_dir):
+
+        result_cache = self._get_result_cache()
+        if result_cache is None:
+            return None
+        return result_cache.get(configuration_dict["config"], configuration_dir)
+
+
+    def _get_source_cache(self):
+
+        if 'cache' not in self.SETUP._data:
+            return None
+        if getattr(self, "_source_cache", None) is None:
+            self._source_cache = SourceCache.from_transformer(self)
+
+            # for each source file, the variables whose kinds have a bearing on its transformed
+            # source, i.e., its own variables and the variables they are bound to, and the files
+            # those belong to
+            self._interface_vars = {}
+            self._interface_files = {}
+            for _, transformer in self.source_transformers_dict.items():
+                name = transformer.get_name()
+                self._interface_vars[name] = set(transformer.variable_profile.keys())
+                self._interface_files[name] = set()
+                for var_name in transformer.variable_profile.keys():
+                    for neighbor_name in self.G_var.get_neighbors(var_name):
+                        self._interface_vars[name].add(neighbor_name)
+                        neighbor_scope_name = neighbor_name[:neighbor_name.rfind("::")]
+                        if neighbor_scope_name in self.source_transformers_dict:
+                            self._interface_files[name].add(self.source_transformers_dict[neighbor_scope_name].get_name())
+                self._interface_files[name].discard(name)
+
+        return self._source_cache
+
+
+    def _get_build_env(self, working_dir):
+
+        # builds that go through scripts/prose_compiler_cache.py share their compiler outputs;
+        # paths within the project tree being built are hashed relative to its root
+        env = os.environ.copy()
+        if 'cache' in self.SETUP._data:
+            env["PROSE_COMPILER_CACHE"] = os.path.join(self.SETUP['cache']['path'], "objects")
+            env["PROSE_COMPILER_CACHE_BASEDIR"] = os.path.normpath(os.path.join(
+                working_dir,
+                os.path.relpath(self.SETUP['machine']['project_root'], start=self.PROSE_EXPERIMENT_DIR)
+            ))
+        return env
+
+
+    def _get_timeout_policy(self):
+
+        # kept along with the transformer, so that resumed searches keep the runtimes observed so far
+        if getattr(self, "_timeout_policy", None) is None:
+            self._timeout_policy = TimeoutPolicy.from_setup(self.SETUP)
+
+            # searches started before runtimes were recorded keep the timeout they derived from the baseline
+            if self.timeout > 0:
+                self._timeout_policy.baseline_cost = self.timeout / self._timeout_policy.multiplier
+        return self._timeout_policy
+
+
+    def _get_runtimes_path(self, configuration_number):
+        return os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_workspace/__runtimes/{:0>4}".format(configuration_number))
+
+
+    def _get_runtimes(self, configuration_number):
+
+        # runtimes of the model runs of a configuration, as recorded by the process that tested it
+        try:
+            with open(self._get_runtimes_path(configuration_number), "r") as f:
+                return [float(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+
+    def _get_sandbox_mode(self, sandbox_root, shared=False):
+
+        if self.SETUP['sandbox']['mode'] == "auto":
+            return Sandbox.probe(sandbox_root, shared)
+        return self.SETUP['sandbox']['mode']
+
+
+    def _new_sandbox(self, snapshot_path, path, link_patterns=""):
+        return Sandbox.new(self.sandbox_mode, snapshot_path, path, link_patterns, self.SETUP['sandbox']['copy_patterns'])
+
+
+    def _get_search_status(self):
+
+        # folds in the results logged since the last update, whichever process logged them
+        if getattr(self, "_search_status", None) is None:
+            self._search_status = SearchStatus(
+                os.path.join(self.PROSE_EXPERIMENT_DIR, RESULTS_LOG_PATH),
+                os.path.join(self.PROSE_EXPERIMENT_DIR, STATUS_PATH),
+            )
+        return self._search_status
+
+
+    def _get_module_dependencies(self):
+
+        # the project index is built again, since the source files may have changed since it was last used
+        if getattr(self, "_module_dependencies", None) is None:
+            invalidate_project_indices(path=os.path.join(self.PROSE_EXPERIMENT_DIR, PROJECT_INDEX_PATH), use_digests=self.SETUP['machine']['index_digests'] == 'true')
+            self._module_dependencies = scan_module_dependencies(self.SETUP['machine']['src_search_paths'].split("|"))
+        return self._module_dependencies
+
+
+    def _cache_result(self, configuration_dict, configuration_dir, total_cost, targeted_subset_cost, message, measured_cost=None):
+
+        result_cache = self._get_result_cache()
+
+        # only outcomes that the configuration determines are cached; timeouts depend on the timeouts in effect,
+        # and runtime failures, e.g., a failed launch or an unparseable eval output, may not happen again
+        if result_cache is None or "(timeout)" in message or "(stalled)" in message or "(runtime failure)" in message:
+            return
+
+        result_cache.put(configuration_dict["config"], configuration_dir, {
+            "total_cost" : total_cost,
+            "targeted_subset_cost" : targeted_subset_cost,
+            "label" : re.search(r"\[(PASSED|FAILED|INVALID)\]", message).group(1),
+            "message" : message[message.find(":") + 1:].strip(),
+            "cost" : measured_cost,
+        })
+
+
+    def _log_variant(self, configuration_dict, configuration_number, message, total_cost=np.inf, targeted_subset_cost=np.inf, measured_cost=None, predicted_cost_ratio=None, cached=False):
+
+        # measured_cost is the cost reported by the eval command, i.e., the subset cost if there is one, for
+        # variants that ran to completion, passing or not; None for variants that did not get that far
+        instrumentation = getattr(self, "_instrumentation", None) or Instrumentation()
+        if self.SETUP['search']['trace'] == "true":
+            instrumentation.write_trace_events(os.path.join(self.PROSE_EXPERIMENT_DIR, TRACE_EVENTS_PATH))
+
+        append_record({
+            "record" : "variant",
+            "configuration_number" : int(configuration_number),
+            "configuration_hash" : digest_configuration(configuration_dict["config"]),
+            "label" : re.search(r"\[(PASSED|FAILED|INVALID|CANCELLED)\]", message).group(1),
+            "message" : message,
+            "cost" : measured_cost,
+            "total_cost" : total_cost,
+            "targeted_subset_cost" : targeted_subset_cost,
+            "predicted_cost_ratio" : predicted_cost_ratio,
+            "cached" : cached,
+            "stages" : {stage_name : seconds for stage_name, seconds in instrumentation.timers.items() if stage_name in STAGE_NAMES},
+            "instrumentation" : instrumentation.get_summary(),
+            "delta_size" : len(configuration_dict["delta"]) if "delta" in configuration_dict else None,
+            "inv" : configuration_dict.get("inv"),
+            "time" : time.time(),
+        }, os.path.join(self.PROSE_EXPERIMENT_DIR, RESULTS_LOG_PATH))
+
+
+    @contextmanager
+    def _stage(self, stage_name, configuration_number):
+
+        # time one stage of testing a configuration; subclasses may also gate how many variants occupy a stage at once
+        with self._instrumentation.timer(stage_name, configuration_number=int(configuration_number)):
+            yield
+
+
+    def _enable_cancellation(self):
+
+        # called in a variant process; the variant process and every command it spawns form a
+        # process group that is sent SIGTERM if the configuration is cancelled
+        def cancel(signum, frame):
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            raise ConfigurationCancelled()
+
+        signal.signal(signal.SIGTERM, cancel)
+        os.setpgrp()
+
+
+    def _disable_cancellation(self):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+    @contextmanager
+    def _cancellation_deferred(self):
+
+        # a cancellation arriving in the meantime takes effect once the block is left
+        signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGTERM])
+        try:
+            yield
+        finally:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, [signal.SIGTERM])
+
+
+    def _cancel_configuration(self, process):
+
+        # returns False if the variant process has not set up its process group yet
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            return True
+        except ProcessLookupError:
+            return False
+
+
+    def _cancel_dominated_configurations(self, search_algorithm, in_flight, cancelled):
+
+        # kill the variant processes whose results the search algorithm no longer needs; returns
+        # whether any cancellation could not be delivered yet and has to be retried shortly
+        undelivered = False
+        for configuration_number in search_algorithm.get_cancellations():
+            if configuration_number in in_flight and configuration_number not in cancelled:
+                if self._cancel_configuration(in_flight[configuration_number][0]):
+                    cancelled.add(configuration_number)
+                else:
+                    undelivered = True
+        return undelivered
+
+
+    def _record_cancellation(self, configuration_dict, configuration_number, configuration_dir):
+
+        message = "{:0>4}: [CANCELLED] outperformed by another variant of the same batch".format(configuration_number)
+        if os.path.exists(os.path.join(configuration_dir, "config")):
+            os.rename(os.path.join(configuration_dir, "config"), os.path.join(configuration_dir, "config_CANCELLED"))
+
+        print("\t **{}".format(message[message.find(":") + 1:]))
+        self._log_variant(configuration_dict, configuration_number, message)
+
+        self.reset_project()
+
+
     def report(self, final=False):
 
         # search log processing
+        variants = get_variants(os.path.join(self.PROSE_EXPERIMENT_DIR, RESULTS_LOG_PATH))
         buffer = []
-        failed_costs = []
-        passed_costs = []
-        for message_file in sorted(os.listdir(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_workspace/__search_progress")), key=lambda x: int(x)):
-            with open(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_workspace/__search_progress", message_file), "r") as f:
-                
-                line = f.readline()
-
-                tokens = line.split()
-                if "cost =" in line and "[PASSED]" in tokens:
-                    cost = float(tokens[tokens.index("=") + 1])
-                    failed_costs.append(np.inf)
-                    passed_costs.append(cost)
-                elif "cost =" in line and "[FAILED]" in tokens:
-                    cost = float(tokens[tokens.index("=") + 1])
-                    failed_costs.append(cost)
-                    passed_costs.append(np.inf)
-                else:
-                    failed_costs.append(np.inf)
-                    passed_costs.append(np.inf)
-                    
-                buffer.append(line)
-
-        buffer.append("\n          Original cost = {:.3f}\n".format(passed_costs[0]))
-        buffer.append("Best FAILED: {:0>4}, cost = {:.3f} ({:.3f}x speedup)\n".format(np.argmin(failed_costs), np.min(failed_costs), passed_costs[0]/np.min(failed_costs)))
-        buffer.append("Best PASSED: {:0>4}, cost = {:.3f} ({:.3f}x speedup)\n".format(np.argmin(passed_costs), np.min(passed_costs), passed_costs[0]/np.min(passed_costs)))
+        failed_costs = {}
+        passed_costs = {}
+        for configuration_number, record in variants.items():
+
+            cost = get_cost(record)
+            if cost is not None and record["label"] == "PASSED":
+                passed_costs[configuration_number] = cost
+            elif cost is not None and record["label"] == "FAILED":
+                failed_costs[configuration_number] = cost
+
+            buffer.append("{}\n".format(record["message"]))
+
+        best_failed = min(failed_costs, key=failed_costs.get, default=0)
+        best_passed = min(passed_costs, key=passed_costs.get, default=0)
+        buffer.append("\n          Original cost = {:.3f}\n".format(passed_costs.get(0, np.inf)))
+        buffer.append("Best FAILED: {:0>4}, cost = {:.3f} ({:.3f}x speedup)\n".format(best_failed, failed_costs.get(best_failed, np.inf), passed_costs.get(0, np.inf)/failed_costs.get(best_failed, np.inf)))
+        buffer.append("Best PASSED: {:0>4}, cost = {:.3f} ({:.3f}x speedup)\n".format(best_passed, passed_costs.get(best_passed, np.inf), passed_costs.get(0, np.inf)/passed_costs.get(best_passed, np.inf)))
         
         if not final:
             for line in buffer:
@@ -421,17 +797,36 @@ class ProseProjectTransformer:
             with open(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_logs/search_log.txt"), "w") as f:
                 f.writelines(buffer)
 
-            # timer processing
-            for timer_label in ["apply_configuration", "compile", "execute", "evaluate"]:
-                buffer = []
-                for message_file in sorted(os.listdir(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_workspace/__timers/{}".format(timer_label)))):
-                    _, time = message_file.split("_")
-                    buffer.append(float(time))
+            # timer processing; the stages first, then the steps timed within them, each per variant
+            summaries = [record["instrumentation"] for record in variants.values() if "instrumentation" in record]
+            histograms = merge_histograms(summaries)
+            for timer_label in STAGE_NAMES + sorted(set(histograms) - set(STAGE_NAMES)):
+                if timer_label in STAGE_NAMES:
+                    buffer = [record["stages"][timer_label] for record in variants.values() if timer_label in record["stages"]]
+                else:
+                    buffer = [summary["timers"][timer_label] for summary in summaries if timer_label in summary["timers"]]
+                if not buffer:
+                    continue
                 with open(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_logs/timers.txt"), "a") as f:
                     f.write("\n{} details:\n".format(timer_label))
                     f.write("\t    total: {}\n".format(timedelta(seconds=np.sum(buffer))))
                     f.write("\t     mean: {}\n".format(timedelta(seconds=np.mean(buffer))))
                     f.write("\t variance: {}\n".format(timedelta(seconds=np.var(buffer))))
+                    if timer_label in histograms:
+                        f.write("\t    spans: {}\n".format(", ".join(["{} <= {}s".format(count, upper_bound) for upper_bound, count in histograms[timer_label].to_dict()["buckets"].items()])))
+
+            counters = {}
+            for summary in summaries:
+                for name, value in summary["counters"].items():
+                    counters[name] = counters.get(name, 0) + value
+            if counters:
+                with open(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_logs/timers.txt"), "a") as f:
+                    f.write("\ncounters:\n")
+                    for name, value in sorted(counters.items()):
+                        f.write("\t {}: {}\n".format(name, value))
+
+            if self.SETUP['search']['trace'] == "true":
+                export_chrome_trace(os.path.join(self.PROSE_EXPERIMENT_DIR, TRACE_EVENTS_PATH), os.path.join(self.PROSE_EXPERIMENT_DIR, TRACE_PATH))
 
 
     def reset_project(self):
@@ -491,28 +886,12 @@ class ProseProjectTransformer:
 
     def _load_G_proc(self):
 
-        # Parse G_proc.dot
-        with open("prose_logs/__G_proc.dot", "r") as f:
-            lines = f.readlines()
-
-            # load all vertices, already in vertexD order
-            for line in lines:
-                if "{" in line or "}" in line:
-                    continue    # skip first and last line of .dot file
-                elif line.find("->") == -1:
-                    scope_name = line.split('"')[1]
-                    assert( scope_name == scope_name.lower() )
-                    self.GP_vertex_map.append(scope_name)
-
-            # initialize G_proc
-            self.G_proc = np.zeros((len(self.GP_vertex_map), len(self.GP_vertex_map)))
+        # load all vertices, already in vertexD order, and the calls between them
+        self.GP_vertex_map, callers, callees, _ = load_graph("prose_logs/__G_proc.dot")
+        for scope_name in self.GP_vertex_map:
+            assert( scope_name == scope_name.lower() )
 
-            # load all edges
-            for line in lines:
-                if line.find("->") != -1:
-                    source_vertexD = int(line.split('-')[0].strip())
-                    target_vertexD = int(line.split('[')[0].split('>')[1].strip())
-                    self.G_proc[source_vertexD][target_vertexD] += 1
+        self.G_proc = CallGraph(self.GP_vertex_map, callers, callees)
 
 
     def _construct_source_transformers(self):
@@ -535,45 +914,84 @@ class ProseProjectTransformer:
 
     def _apply_configuration(self, working_dir, configuration_dir, node_name=""):
 
-        # write out the list of files to be transformed; will be read in by the plugin
-        with open(os.path.join(working_dir, "prose_workspace/__target_files.txt"), "w") as f:
-            for src_file_path in self.src_to_transform:
-                f.write(src_file_path + "\n")
-                self.source_transformers_dict[os.path.basename(src_file_path[:src_file_path.rfind(".")]).lower()].pre_transform_process(working_dir)
+        source_transformers = [self.source_transformers_dict[os.path.basename(src_file_path[:src_file_path.rfind(".")]).lower()] for src_file_path in self.src_to_transform]
+        for transformer in source_transformers:
+            transformer.pre_transform_process(working_dir)
 
-        prose_command = [
-            "{}/rose-compiler".format(self.ROSE_EXE_PATH),
-            "-rose:plugin_lib","{}/ProsePlugin.so".format(self.PROSE_PLUGIN_PATH),
-            "-rose:plugin_action","prose-apply-configuration",
-            "-rose:plugin_arg_prose-apply-configuration", working_dir,
-            "-rose:plugin_arg_prose-apply-configuration", configuration_dir,
-            "-rose:skip_syntax_check",
-            "-rose:skip_unparse",
-            "-rose:skipfinalCompileStep",
-            "-Drose_comp",
-            "-I{}/prose_workspace/rmod_files".format(self.PROSE_EXPERIMENT_DIR),
-            self.SETUP['target']['additional_plugin_flags'],
-            os.path.join(working_dir, self.SETUP['target']['src_files'].split("|")[0])
-        ]
+        # files whose slice of the configuration has been transformed before are taken from the source
+        # cache; the plugin is only run on the remaining files and on the files they are bound to
+        source_cache = self._get_source_cache()
+        if source_cache is None:
+            files_to_transform = set([transformer.get_name() for transformer in source_transformers])
+        else:
+            configuration = {}
+            with open(os.path.join(configuration_dir, "config"), "r") as f:
+                for line in f:
+                    if line.strip():
+                        var_name, var_kind = tuple(line.strip().split(","))
+                        configuration[var_name] = var_kind
+
+            restricted_configurations = {}
+            for transformer in source_transformers:
+                restricted_configurations[transformer.get_name()] = {
+                    var_name : configuration[var_name] for var_name in self._interface_vars.get(transformer.get_name(), []) if var_name in configuration
+                }
+            missed_files = set([name for name, restricted_configuration in restricted_configurations.items() if not source_cache.contains(name, restricted_configuration)])
+            files_to_transform = missed_files.union(*[self._interface_files.get(name, set()) for name in missed_files]).intersection(restricted_configurations)
+
+        # write out the list of files to be transformed, in the original processing order; will be read in by the plugin
+        with open(os.path.join(working_dir, "prose_workspace/__target_files.txt"), "w") as f:
+            for src_file_path, transformer in zip(self.src_to_transform, source_transformers):
+                if transformer.get_name() in files_to_transform:
+                    f.write(src_file_path + "\n")
+
+        if files_to_transform:
+
+            prose_command = [
+                "{}/rose-compiler".format(self.ROSE_EXE_PATH),
+                "-rose:plugin_lib","{}/ProsePlugin.so".format(self.PROSE_PLUGIN_PATH),
+                "-rose:plugin_action","prose-apply-configuration",
+                "-rose:plugin_arg_prose-apply-configuration", working_dir,
+                "-rose:plugin_arg_prose-apply-configuration", configuration_dir,
+                "-rose:skip_syntax_check",
+                "-rose:skip_unparse",
+                "-rose:skipfinalCompileStep",
+                "-Drose_comp",
+                "-I{}/prose_workspace/rmod_files".format(self.PROSE_EXPERIMENT_DIR),
+                self.SETUP['target']['additional_plugin_flags'],
+                os.path.join(working_dir, self.SETUP['target']['src_files'].split("|")[0])
+            ]
+
+            if node_name:
+                prose_command = [f"ssh {node_name} 'source {self.SETUP['Derecho']['env_script']} && cd {working_dir} &&"] + prose_command + ["'"]
+            prose_command = ' '.join(prose_command)
 
-        if node_name:
-            prose_command = [f"ssh {node_name} 'source {self.SETUP['Derecho']['env_script']} && cd {working_dir} &&"] + prose_command + ["'"]
-        prose_command = ' '.join(prose_command)
+            try:
+                with self._instrumentation.timer("plugin", num_files=len(files_to_transform)):
+                    subprocess.run(
+                        prose_command,
+                        check = True,
+                        stdout = subprocess.DEVNULL,
+                        stderr = subprocess.DEVNULL,
+                        cwd = working_dir,
+                        env = os.environ.copy(),
+                        executable="/bin/bash",
+                        shell=True,
+                    )
+            except subprocess.CalledProcessError as e:
+                return -1
+
+        self._instrumentation.count("transformed_files", len(files_to_transform))
+        if source_cache is not None:
+            self._instrumentation.count("source_cache_hits", len(source_transformers) - len(files_to_transform))
+            for transformer in source_transformers:
+                name = transformer.get_name()
+                if name in files_to_transform:
+                    source_cache.put(name, restricted_configurations[name], transformer.get_transformed_file_path(configuration_dir))
+                else:
+                    source_cache.get(name, restricted_configurations[name], os.path.join(configuration_dir, transformer.name_original_file))
+            print("\t ** {} of {} source files taken from the source cache".format(len(source_transformers) - len(files_to_transform), len(source_transformers)))
 
-        try:
-            subprocess.run(
-                prose_command,
-                check = True,
-                stdout = subprocess.DEVNULL,
-                stderr = subprocess.DEVNULL,
-                cwd = working_dir,
-                env = os.environ.copy(),
-                executable="/bin/bash",
-                shell=True,
-            )
-        except subprocess.CalledProcessError as e:
-            return -1
-   
         return 0
 
 
@@ -582,11 +1000,20 @@ class ProseProjectTransformer:
         # unslice and move all of the transformed source code to the proper
         # locations in order to be compiled
         print("\t ** unslicing")
-        with open(os.path.join(working_dir, "prose_workspace/__target_files.txt"), "r") as f:
-            target_file_paths = f.readlines()
-            for target_file_path in target_file_paths:
-                transformer = self.source_transformers_dict[os.path.basename(target_file_path[:target_file_path.rfind(".")]).lower()]
-                transformer.post_transform_process(working_dir, configuration_dir, self.SETUP)
+        rebuild_driver = RebuildDriver(working_dir)
+        with self._instrumentation.timer("unslice"):
+            for src_file_path in self.src_to_transform:
+                transformer = self.source_transformers_dict[os.path.basename(src_file_path[:src_file_path.rfind(".")]).lower()]
+                transformer.post_transform_process(working_dir, configuration_dir, self.SETUP, rebuild_driver)
+
+        # nothing to do if the build products already reflect all of the transformed source code, e.g., on a source cache hit
+        recompile_set = rebuild_driver.report(configuration_dir, self._get_module_dependencies())
+        if not rebuild_driver.needs_build():
+            print("\t ** no source files changed since the last build; skipping compilation")
+            return 0
+        print("\t ** {} source files changed, {} source files to recompile".format(len(rebuild_driver.changed_src_paths), len(recompile_set)))
+        self._instrumentation.count("changed_files", len(rebuild_driver.changed_src_paths))
+        self._instrumentation.count("recompiled_files", len(recompile_set))
 
         command = self.SETUP['build']['partial_build_cmd'].split()
 
@@ -600,17 +1027,19 @@ class ProseProjectTransformer:
         command = " ".join(command)
 
         print("\t ** compiling")
+        rebuild_driver.begin_build()
         try:
-            subprocess.run(
-                command,
-                check = True,
-                shell = True,
-                executable="/bin/bash",
-                env = os.environ.copy(),
-                cwd = os.path.join(working_dir, self.SETUP['build']['working_dir']),
-                stdout = subprocess.PIPE,
-                stderr = subprocess.STDOUT,
-            )
+            with self._instrumentation.timer("build"):
+                subprocess.run(
+                    command,
+                    check = True,
+                    shell = True,
+                    executable="/bin/bash",
+                    env = self._get_build_env(working_dir),
+                    cwd = os.path.join(working_dir, self.SETUP['build']['working_dir']),
+                    stdout = subprocess.PIPE,
+                    stderr = subprocess.STDOUT,
+                )
 
         except subprocess.CalledProcessError as e:
             compile_log = e.output.decode("utf-8").splitlines()
@@ -619,6 +1048,7 @@ class ProseProjectTransformer:
                     f.write(line+"\n")
             return -2
 
+        rebuild_driver.finish_build()
         return 0
 
 
@@ -662,19 +1092,20 @@ class ProseProjectTransformer:
         command = " ".join(command)
 
         try:
-            with open(os.path.join(configuration_dir, "outlog.txt"), "w") as outfile:
-                subprocess.run(
+            self._instrumentation.count("model_runs")
+            with open(os.path.join(configuration_dir, "outlog.txt"), "w") as outfile, self._instrumentation.timer("run"):
+                runtime = self._get_timeout_policy().run(
                             command,
-                            check=True,
+                            outfile,
                             env=os.environ.copy(),
                             cwd=os.path.join(working_dir, self.SETUP['run']['working_dir']),
-                            stdout=outfile,
-                            stderr=outfile,
                             timeout=timeout,
-                            shell=True,
-                            executable="/bin/bash"
-                        )      
-            
+                        )
+
+            os.makedirs(os.path.dirname(self._get_runtimes_path(os.path.basename(configuration_dir))), exist_ok=True)
+            with open(self._get_runtimes_path(os.path.basename(configuration_dir)), "a") as f:
+                f.write("{}\n".format(runtime))
+
             return None
 
         except subprocess.SubprocessError as e:
@@ -691,13 +1122,14 @@ class ProseProjectTransformer:
             command += [configuration_dir, original_configuration_dir]            
         command = " ".join(command)
 
-        evaluation_output = subprocess.check_output(
-                        command,
-                        env=os.environ.copy(),
-                        cwd=os.path.join(working_dir, self.SETUP['eval']['working_dir']),
-                        shell=True,
-                        executable="/bin/bash",
-                    )
+        with self._instrumentation.timer("eval_cmd"):
+            evaluation_output = subprocess.check_output(
+                            command,
+                            env=os.environ.copy(),
+                            cwd=os.path.join(working_dir, self.SETUP['eval']['working_dir']),
+                            shell=True,
+                            executable="/bin/bash",
+                        )
         
         evaluation_output = evaluation_output.decode("utf-8").splitlines()
         try:
@@ -710,10 +1142,11 @@ class ProseProjectTransformer:
         else:
 
             # parse gptl subset timing if available
-            if self.SETUP['target']['ignore_patterns']:
-                targeted_subset_cost = gptl_parse_subset(self.SETUP['target']['search_patterns'].split("|"), self.SETUP['target']['ignore_patterns'].split("|"), working_dir)
-            else:
-                targeted_subset_cost = gptl_parse_subset(self.SETUP['target']['search_patterns'].split("|"), [], working_dir)
+            with self._instrumentation.timer("gptl_parse"):
+                if self.SETUP['target']['ignore_patterns']:
+                    targeted_subset_cost = gptl_parse_subset(self.SETUP['target']['search_patterns'].split("|"), self.SETUP['target']['ignore_patterns'].split("|"), working_dir)
+                else:
+                    targeted_subset_cost = gptl_parse_subset(self.SETUP['target']['search_patterns'].split("|"), [], working_dir)
             
             # save the info generated from the call above
             subprocess.run(f"tar -czf {configuration_dir}/gptl_timing.tar.gz timing.* && rm timing.*", shell=True, executable="/bin/bash", cwd=working_dir)
@@ -776,67 +1209,68 @@ class ProseProjectTransformer:
 
     def _propagate_constants(self):
 
-        def flows_to(var1, var2):
-            scope_name1 = var1[:var1.rfind("::")]
-            scope_name2 = var2[:var2.rfind("::")]
-
-            failed = False
-            try:
-                scope1_vertexD = self.GP_vertex_map.index(scope_name1)
-            except:
-                print("Couldn't find scope for {}; likely an imported constant? skipping".format(var1))
-                failed = True
-            try:
-                scope2_vertexD = self.GP_vertex_map.index(scope_name2)
-            except:
-                print("Couldn't find scope for {}; likely an imported constant? skipping".format(var2))
-                failed = True
-            if failed:
-                return False
-
-            if self.G_proc[scope1_vertexD][scope2_vertexD] > 0:
-                return True
-            else:
-                return False
-
-        inter_bindings = {}
-        # build up a directed graph (adjacency list) of
-        # interprocedural variable bindings
+        # number the variables of all interprocedural bindings and build a directed graph (adjacency sets) in which
+        # a variable points to the variables of the same binding whose scopes are called from its scope
+        var_indices = {}
+        successors = []
+        unknown_vars = set()
         with open("prose_workspace/__inter_bound_variables.txt", 'r') as f:
             for line in f:
-                binding = [x for x in line.strip().split(";") if x != ""]
-                for var_name in binding:
-                    inter_bindings[var_name] = inter_bindings.get(var_name, set()).union(set([x for x in binding if flows_to(var_name, x)]))
-
-        discovered_constant_vars = set()
-        constant_bindings = []
+                binding = []
+                for var_name in [x for x in line.strip().split(";") if x != ""]:
+                    if var_name not in var_indices:
+                        var_indices[var_name] = len(successors)
+                        successors.append(set())
+
+                    scope_name = var_name[:var_name.rfind("::")]
+                    if scope_name in self.G_proc:
+                        binding.append((var_indices[var_name], scope_name))
+                    elif var_name not in unknown_vars:
+                        print("Couldn't find scope for {}; likely an imported constant? skipping".format(var_name))
+                        unknown_vars.add(var_name)
+
+                for from_index, scope_name1 in binding:
+                    for to_index, scope_name2 in binding:
+                        if self.G_proc.calls(scope_name1, scope_name2):
+                            successors[from_index].add(to_index)
 
         # read constant list file, each line is one const
+        discovered_constant_vars = set()
         with open("prose_workspace/constant_list.txt", 'r') as f:
             for line in f:
-                var_name = line
-                discovered_constant_vars.add(var_name.strip())
-
-        # propagate constants
-        for constant_var in discovered_constant_vars:
-            stack = [constant_var]
-            visited = set()
-            const_propagation = set()
-
-            while len(stack) != 0:
-                from_var = stack.pop()
-                if from_var not in visited and from_var in inter_bindings:
-                    visited.add(from_var)
-                    const_propagation.add(from_var)
-                    stack = stack + list(inter_bindings[from_var])
-
-            const_propagation.discard(constant_var)
-            constant_bindings.append(const_propagation)
+                discovered_constant_vars.add(line.strip())
+
+        # a variable is a propagated constant if it is reachable from a constant other than itself; within a strongly
+        # connected component every variable reaches every other one, so one pass over the components in topological
+        # order, i.e., the reverse of the order they are found in, tells which ones are reached from upstream constants
+        is_constant = [False] * len(successors)
+        for var_name in discovered_constant_vars:
+            if var_name in var_indices:
+                is_constant[var_indices[var_name]] = True
+
+        components = get_strongly_connected_components(successors)
+        component_of = [0] * len(successors)
+        for component_index, component in enumerate(components):
+            for var_index in component:
+                component_of[var_index] = component_index
+
+        reached = [False] * len(components)
+        propagated = [False] * len(successors)
+        for component_index in reversed(range(len(components))):
+            component = components[component_index]
+            num_constants = sum(is_constant[var_index] for var_index in component)
+            for var_index in component:
+                propagated[var_index] = reached[component_index] or num_constants > is_constant[var_index]
+
+            if reached[component_index] or num_constants > 0:
+                for var_index in component:
+                    for successor in successors[var_index]:
+                        reached[component_of[successor]] = True
 
         # write out propagated constant list
         with open("prose_workspace/constant_list.txt", 'w') as f:
-            for binding in constant_bindings:
-                for var_name in binding:
+            for var_name in sorted(var_indices):
+                if propagated[var_indices[var_name]]:
                     f.write(var_name + "\n")
 
 
@@ -864,11 +1298,6 @@ class DerechoProseProjectTransformer(ProseProjectTransformer):
         os.makedirs(self.scratch_path)
 
 
-    def _save(self):
-        with open(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_workspace/__DerechoProseProjectTransformer.pckl"), "wb") as f:
-            pickle.dump(self, f)
-    
-
     def generate_search_space(self, path_to_setup_file=None):
 
         search_space = super().generate_search_space(path_to_setup_file)
@@ -904,6 +1333,15 @@ class DerechoProseProjectTransformer(ProseProjectTransformer):
         if float(self.SETUP['eval']['cost_threshold']) > 0:
             search_algorithm.set_cost_threshold(float(self.SETUP['eval']['cost_threshold']))
 
+        # digest the search context once up front rather than in every variant
+        self._get_result_cache()
+        self._get_source_cache()
+        self._get_module_dependencies()
+        self._get_search_status().update()
+
+        # the static analysis results are complete by now; from here on, only the search state changes
+        self._save(search_algorithm)
+
         result = subprocess.run(
             'for x in $(cat $PBS_NODEFILE | sort | uniq | cut -d"". -f1); do if [[ "$(hostname)" == ${x} ]]; then continue; else echo ${x}; fi; done',
             shell=True,
@@ -912,55 +1350,67 @@ class DerechoProseProjectTransformer(ProseProjectTransformer):
             executable="/bin/bash"
         )
         node_list = [x for x in result.stdout.split("\n") if x]
+
+        # variants run on other nodes, so their sandboxes must live on the shared scratch file system
+        self.sandbox_mode = self._get_sandbox_mode(self.scratch_path, shared=True)
+        print("** using {} sandboxes".format(self.sandbox_mode))
         shared_q_avail_nodes = mp.Queue(maxsize=len(node_list))
         for node_name in node_list:
             shared_q_avail_nodes.put(node_name)
 
-        batch = search_algorithm.get_next_batch()
-        while batch:
-
-            shared_q_process_returns = mp.Queue(maxsize=len(batch))
-            for i in range(len(batch)):
-                node_name = shared_q_avail_nodes.get(block=True)
-                mp.Process(
-                    target=self._test_configuration,
-                    args=(
-                        batch[i],
-                        self.last_completed_configuration_number + 1 + i,
-                        node_name,
-                        shared_q_avail_nodes,
-                        shared_q_process_returns,
-                    )
-                ).start()
-
-            costs = [(None, None)]*len(batch)
-            for i in range(len(batch)):
-                configuration_number, cost = shared_q_process_returns.get(block=True)
-                costs[configuration_number - self.last_completed_configuration_number - 1] = cost
-
-            for i in range(len(batch)):
-                if self.timeout < 0: # should only happen on the default (first) configuration
-                    if self.SETUP['run']['timeout'] == '0':
-                        try:
-                            self.timeout = int(np.ceil(costs[0][0] * 3.0))
-                        except OverflowError:
-                            print("Default configuration appears to have failed; exiting.")
-                            exit(1)
-                    else:
-                        self.timeout = int(float(self.SETUP['run']['timeout']))
-
-                # take subset cost if present; otherwise, take total cost
-                if costs[i][1] != 0:
-                    batch[i]["cost"] = costs[i][1]
-                else:
-                    batch[i]["cost"] = costs[i][0]
-
-                search_algorithm.feedback(batch[i])
-            
-            self.last_completed_configuration_number += len(batch)
-            batch = search_algorithm.get_next_batch()
-
-            self._save()
+        # keep every node busy with whatever configurations the search algorithm can propose
+        shared_q_process_returns = mp.Queue()
+        in_flight = {}
+        cancelled = set()
+        undelivered = False
+        exhausted = False
+        try:
+            while True:
+
+                if not exhausted and len(in_flight) < len(node_list):
+                    proposals = search_algorithm.propose(len(node_list) - len(in_flight))
+                    if proposals is None:
+                        exhausted = True
+                        proposals = []
+
+                    predicted_cost_ratios = self._predict_cost_ratios([configuration_dict for _, configuration_dict in proposals])
+                    for (configuration_number, configuration_dict), predicted_cost_ratio in zip(proposals, predicted_cost_ratios):
+                        node_name = shared_q_avail_nodes.get(block=True)
+                        process = mp.Process(
+                            target=self._test_configuration,
+                            args=(
+                                configuration_dict,
+                                configuration_number,
+                                node_name,
+                                shared_q_avail_nodes,
+                                shared_q_process_returns,
+                                predicted_cost_ratio,
+                            )
+                        )
+                        process.start()
+                        in_flight[configuration_number] = (process, configuration_dict)
+
+                if not in_flight:
+                    break
+
+                try:
+                    configuration_number, cost = shared_q_process_returns.get(block=True, timeout=1 if undelivered else None)
+                except queue.Empty:
+                    undelivered = self._cancel_dominated_configurations(search_algorithm, in_flight, cancelled)
+                    continue
+                process, configuration_dict = in_flight.pop(configuration_number)
+                process.join()
+                cancelled.discard(configuration_number)
+                self._report_result(search_algorithm, configuration_number, configuration_dict, cost)
+
+                # variants still in flight may have been made pointless by this result
+                undelivered = self._cancel_dominated_configurations(search_algorithm, in_flight, cancelled)
+
+        # variant processes run in process groups of their own, which an interrupt does not reach
+        except KeyboardInterrupt:
+            for process, _ in in_flight.values():
+                self._cancel_configuration(process)
+            raise
 
         with open(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_logs/timers.txt"), "a") as f:
             f.write("{} search\n".format(timedelta(seconds=time.time()-start)))
@@ -971,37 +1421,319 @@ class DerechoProseProjectTransformer(ProseProjectTransformer):
         except OSError:
             pass
         
-        self._save()
+        self._save(search_algorithm)
         self.report(final=True)
 
     def test_configuration(self, configuration_file_path, path_to_setup_file=None):
         super().test_configuration(configuration_file_path, path_to_setup_file, node_name="offline")
 
 
-    def _test_configuration(self, configuration_dict, configuration_number, node_name, shared_q_avail_nodes, shared_q_process_returns):
+    def _test_configuration(self, configuration_dict, configuration_number, node_name, shared_q_avail_nodes, shared_q_process_returns, predicted_cost_ratio=None):
 
-        # copy backed-up "original" directory in the scratch space into its own experiment directory
+        # sandbox the backed-up "original" directory in the scratch space as this variant's own experiment directory
         new_project_root = os.path.join(self.scratch_path, "{:0>4}".format(configuration_number))
-        if os.path.exists(new_project_root):
-            shutil.rmtree(new_project_root)
-        shutil.copytree(
-            os.path.join(self.scratch_path, "original"),
-            new_project_root,
-            symlinks=True,
-        )
+        sandbox = self._new_sandbox(os.path.join(self.scratch_path, "original"), new_project_root)
+        sandbox.destroy()
+        sandbox.create()
         
         working_dir = os.path.abspath(os.path.join(new_project_root, os.path.relpath(self.PROSE_EXPERIMENT_DIR, start=self.SETUP['machine']['project_root'])))
 
-        cost = super()._test_configuration(configuration_dict, configuration_number, working_dir, node_name)
+        # a cancelled variant frees its node right away; killing the ssh client ends the run on the node
+        cost = (np.inf, np.inf)
+        try:
+            self._enable_cancellation()
+            cost = super()._test_configuration(configuration_dict, configuration_number, working_dir, node_name, predicted_cost_ratio)
+            self._disable_cancellation()
+        except ConfigurationCancelled:
+            self._record_cancellation(configuration_dict, configuration_number, os.path.join(working_dir, "prose_logs/{:0>4}".format(configuration_number)))
+
         shared_q_avail_nodes.put(node_name)
         shared_q_process_returns.put((configuration_number, cost))
 
         # copy everything back to the OG experiment directory and clean up 
+        configuration_dir = os.path.join(new_project_root, os.path.join(os.path.relpath("prose_logs", start=self.SETUP['machine']['project_root']),"{:0>4}".format(configuration_number)))
+        if os.path.exists(configuration_dir):
+            shutil.copytree(configuration_dir, os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_logs/{:0>4}".format(configuration_number)))
+        sandbox.destroy()
+
+
+class LocalProseProjectTransformer(ProseProjectTransformer):
+
+    def __new__(cls, *args, **kwargs):
+        return super(LocalProseProjectTransformer, cls).__new__(cls)
+
+    def __init__(self, path_to_setup_file):
+
+        super(LocalProseProjectTransformer, self).__init__(path_to_setup_file)
+
+        assert not os.path.relpath(self.PROSE_EXPERIMENT_DIR, start=self.SETUP['machine']['project_root']).startswith(os.pardir), "the experiment directory must be located within the project root to run a local parallel search"
+
+        # partition the cores available to this process into slots; each variant under test is pinned to one slot
+        available_cores = sorted(os.sched_getaffinity(0))
+        cores_per_slot = int(self.SETUP['parallel']['cores_per_slot'])
+        num_slots = min(int(self.SETUP['parallel']['slots']), max(1, len(available_cores) // cores_per_slot))
+        self.slots = [available_cores[i * cores_per_slot:(i + 1) * cores_per_slot] or available_cores for i in range(num_slots)]
+
+        self.sandbox_path = self.SETUP['parallel']['sandbox_root'] + self.SETUP['machine']['project_root']
+        if os.path.exists(self.sandbox_path):
+            shutil.rmtree(self.sandbox_path)
+        os.makedirs(self.sandbox_path)
+
+
+    def generate_search_space(self, path_to_setup_file=None):
+
+        search_space = super().generate_search_space(path_to_setup_file)
+
+        # snapshot the freshly built project; every variant is tested in a clone of this snapshot
+        original_path = os.path.join(self.sandbox_path, "original")
+        if os.path.exists(original_path):
+            shutil.rmtree(original_path)
+
         shutil.copytree(
-            os.path.join(new_project_root, os.path.join(os.path.relpath("prose_logs", start=self.SETUP['machine']['project_root']),"{:0>4}".format(configuration_number))),
-            os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_logs/{:0>4}".format(configuration_number))
+            self.SETUP['machine']['project_root'],
+            original_path,
+            ignore=shutil.ignore_patterns(*(self.SETUP['parallel']['copy_ignore'].split("|") + ["prose_logs", "prose_workspace", ".git"])),
+            symlinks=True,
+        )
+        shutil.copytree(
+            os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_workspace"),
+            os.path.join(original_path, os.path.relpath(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_workspace"), start=self.SETUP['machine']['project_root'])),
+            ignore=shutil.ignore_patterns("__*"),
+            symlinks=True,
+        )
+        shutil.copytree(
+            os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_logs"),
+            os.path.join(original_path, os.path.relpath(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_logs"), start=self.SETUP['machine']['project_root'])),
+            ignore=shutil.ignore_patterns("__*"),
+            symlinks=True,
         )
-        shutil.rmtree(new_project_root)
+
+        return search_space
+
+
+    def __getstate__(self):
+
+        # the synchronization primitives shared with variant processes only exist for the duration of a search
+        state = super().__getstate__()
+        state.pop("_shared_q_avail_slots", None)
+        state.pop("_stage_semaphores", None)
+        state.pop("_shared_q_avail_build_trees", None)
+        return state
+
+
+    def search(self, search_algorithm):
+        start = time.time()
+
+        if float(self.SETUP['eval']['cost_threshold']) > 0:
+            search_algorithm.set_cost_threshold(float(self.SETUP['eval']['cost_threshold']))
+
+        # digest the search context once up front rather than in every variant
+        self._get_result_cache()
+        self._get_source_cache()
+        self._get_module_dependencies()
+        self._get_search_status().update()
+
+        # the static analysis results are complete by now; from here on, only the search state changes
+        self._save(search_algorithm)
+
+        if not os.path.exists(os.path.join(self.sandbox_path, "original")):
+            raise Exception("[ERROR] No project snapshot found in {}; run generate_search_space() first.".format(self.sandbox_path))
+
+        # core slots are only held while executing; the other stages are bounded by their own worker counts
+        self._shared_q_avail_slots = mp.Queue(maxsize=len(self.slots))
+        for slot in range(len(self.slots)):
+            self._shared_q_avail_slots.put(slot)
+        self._stage_semaphores = {
+            stage_name : mp.BoundedSemaphore(int(self.SETUP['parallel']['{}_workers'.format(stage_name)]))
+            for stage_name in ["apply_configuration", "compile", "evaluate"]
+        }
+        max_in_flight = int(self.SETUP['parallel']['max_in_flight'])
+        shared_q_process_returns = mp.Queue()
+
+        # every variant in flight gets a build tree of its own; build trees are reused by later variants
+        self._shared_q_avail_build_trees = mp.Queue(maxsize=max_in_flight)
+        for build_tree in range(max_in_flight):
+            self._shared_q_avail_build_trees.put(build_tree)
+        self.sandbox_mode = self._get_sandbox_mode(self.sandbox_path)
+
+        print("** testing up to {} variants at once in {} sandboxes; executing in {} slot(s) of {} core(s)".format(max_in_flight, self.sandbox_mode, len(self.slots), len(self.slots[0])))
+
+        in_flight = {}
+        cancelled = set()
+        undelivered = False
+        exhausted = False
+
+        try:
+            while True:
+
+                # top up the pipeline with configurations from the search algorithm
+                if not exhausted and len(in_flight) < max_in_flight:
+                    proposals = search_algorithm.propose(max_in_flight - len(in_flight))
+                    if proposals is None:
+                        exhausted = True
+                        proposals = []
+
+                    predicted_cost_ratios = self._predict_cost_ratios([configuration_dict for _, configuration_dict in proposals])
+                    for (configuration_number, configuration_dict), predicted_cost_ratio in zip(proposals, predicted_cost_ratios):
+                        process = mp.Process(
+                            target=self._test_configuration,
+                            args=(
+                                configuration_dict,
+                                configuration_number,
+                                shared_q_process_returns,
+                                predicted_cost_ratio,
+                            )
+                        )
+                        process.start()
+                        in_flight[configuration_number] = (process, configuration_dict)
+
+                if not in_flight:
+                    break
+
+                try:
+                    configuration_number, cost = shared_q_process_returns.get(block=True, timeout=1 if undelivered else None)
+                except queue.Empty:
+                    undelivered = self._cancel_dominated_configurations(search_algorithm, in_flight, cancelled)
+                    continue
+                process, configuration_dict = in_flight.pop(configuration_number)
+                process.join()
+                cancelled.discard(configuration_number)
+                self._report_result(search_algorithm, configuration_number, configuration_dict, cost)
+
+                # variants still in flight may have been made pointless by this result
+                undelivered = self._cancel_dominated_configurations(search_algorithm, in_flight, cancelled)
+
+        # variant processes run in process groups of their own, which an interrupt does not reach
+        except KeyboardInterrupt:
+            for process, _ in in_flight.values():
+                self._cancel_configuration(process)
+            raise
+
+        with open(os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_logs/timers.txt"), "a") as f:
+            f.write("{} search\n".format(timedelta(seconds=time.time()-start)))
+
+        for build_tree in range(max_in_flight):
+            self._new_sandbox(os.path.join(self.sandbox_path, "original"), os.path.join(self.sandbox_path, "tree_{}".format(build_tree))).destroy()
+        shutil.rmtree(self.sandbox_path, ignore_errors=True)
+        del self._shared_q_avail_slots
+        del self._stage_semaphores
+        del self._shared_q_avail_build_trees
+
+        self._save(search_algorithm)
+        self.report(final=True)
+
+
+    @contextmanager
+    def _stage(self, stage_name, configuration_number):
+
+        if stage_name != "execute":
+            with self._stage_semaphores[stage_name]:
+                with super()._stage(stage_name, configuration_number):
+                    yield
+            return
+
+        # whatever the model run and the eval command leave behind in the build tree is undone after the variant
+        self._output_listing = self._list_output_files()
+
+        # pin the model run, and every command it spawns, to the cores of a free slot; a cancellation
+        # must not interrupt taking a slot from the queue, which would lose the slot
+        slot = None
+        unpinned_cores = os.sched_getaffinity(0)
+        try:
+            with self._cancellation_deferred():
+                slot = self._shared_q_avail_slots.get(block=True)
+            os.sched_setaffinity(0, self.slots[slot])
+            os.environ["PROSE_SLOT"] = str(slot)
+            os.environ["PROSE_SLOT_CORES"] = ",".join([str(core) for core in self.slots[slot]])
+            os.environ["PROSE_SLOT_NUM_CORES"] = str(len(self.slots[slot]))
+            with super()._stage(stage_name, configuration_number):
+                yield
+        finally:
+            os.sched_setaffinity(0, unpinned_cores)
+            if slot is not None:
+                with self._cancellation_deferred():
+                    self._shared_q_avail_slots.put(slot)
+
+
+    def _list_output_files(self):
+
+        # {path : (size, mtime)} of the files in the run and eval working directories of the build tree
+        listing = {}
+        for output_dir in self._output_dirs:
+            for dir_path, _, file_names in os.walk(output_dir):
+                for file_name in file_names:
+                    path = os.path.join(dir_path, file_name)
+                    try:
+                        stat = os.lstat(path)
+                    except FileNotFoundError:
+                        continue
+                    listing[path] = (stat.st_size, stat.st_mtime_ns)
+        return listing
+
+
+    def _reset_output_files(self):
+
+        # files created, changed or removed since the model run started, e.g., model output and timing files, are put
+        # back the way they are in the snapshot, so that the next variant cannot be evaluated on this variant's output;
+        # build products, which are older, stay for incremental builds
+        listing = self._list_output_files()
+        for path in set(listing) | set(self._output_listing):
+            if listing.get(path) == self._output_listing.get(path):
+                continue
+            if os.path.lexists(path):
+                os.remove(path)
+            snapshot_path = os.path.join(self.sandbox_path, "original", os.path.relpath(path, start=self._new_project_root))
+            if os.path.lexists(snapshot_path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                shutil.copy2(snapshot_path, path, follow_symlinks=False)
+
+
+    def _test_configuration(self, configuration_dict, configuration_number, shared_q_process_returns, predicted_cost_ratio=None):
+
+        cost = (np.inf, np.inf)
+        build_tree = self._shared_q_avail_build_trees.get(block=True)
+        new_project_root = os.path.join(self.sandbox_path, "tree_{}".format(build_tree))
+        sandbox = self._new_sandbox(os.path.join(self.sandbox_path, "original"), new_project_root, self.SETUP['parallel']['link_patterns'])
+        working_dir = os.path.abspath(os.path.join(new_project_root, os.path.relpath(self.PROSE_EXPERIMENT_DIR, start=self.SETUP['machine']['project_root'])))
+        self._new_project_root = new_project_root
+        self._output_listing = None
+
+        try:
+            self._output_dirs = sorted(set([os.path.normpath(os.path.join(working_dir, self.SETUP[section]['working_dir'])) for section in ['run', 'eval']]))
+
+            # build trees start out as a clone of the project snapshot, including the baseline build products,
+            # and keep the build products of the last variant tested in them so that builds are incremental
+            if not sandbox.exists():
+                sandbox.create()
+
+            try:
+                self._enable_cancellation()
+                cost = super()._test_configuration(configuration_dict, configuration_number, working_dir, predicted_cost_ratio=predicted_cost_ratio)
+                self._disable_cancellation()
+
+            # the build tree stays usable since its build state only ever records successful builds
+            except ConfigurationCancelled:
+                self._record_cancellation(configuration_dict, configuration_number, os.path.join(working_dir, "prose_logs/{:0>4}".format(configuration_number)))
+
+            # copy the variant's logs back to the experiment directory
+            if os.path.exists(os.path.join(working_dir, "prose_logs/{:0>4}".format(configuration_number))):
+                shutil.copytree(
+                    os.path.join(working_dir, "prose_logs/{:0>4}".format(configuration_number)),
+                    os.path.join(self.PROSE_EXPERIMENT_DIR, "prose_logs/{:0>4}".format(configuration_number))
+                )
+
+        except:
+            # a build tree left in an unknown state is not handed to another variant
+            sandbox.destroy()
+            raise
+
+        finally:
+            self._disable_cancellation()
+            shutil.rmtree(os.path.join(working_dir, "prose_logs/{:0>4}".format(configuration_number)), ignore_errors=True)
+            if self._output_listing is not None and sandbox.exists():
+                self._reset_output_files()
+            self._shared_q_avail_build_trees.put(build_tree)
+            shared_q_process_returns.put((configuration_number, cost))
 
 
 class ProseSourceTransformer:
@@ -1050,25 +1782,25 @@ class ProseSourceTransformer:
 
 
     def pre_transform_process(self, working_dir):
-        shutil.copy("prose_workspace/original_files/{}.slice".format(self.name_original_file), os.path.join(working_dir, self.path_original_file))
+        write_if_changed("prose_workspace/original_files/{}.slice".format(self.name_original_file), os.path.join(working_dir, self.path_original_file))
 
-    def post_transform_process(self, working_dir, configuration_dir, SETUP):
+    def get_transformed_file_path(self, configuration_dir):
 
         # case insensitive search for transformed file
         matches = [ x for x in os.listdir(configuration_dir) if x.lower() == self.name_original_file.lower() ]
         assert(len(matches) == 1)
+        return os.path.join(configuration_dir, matches[0])
+
+
+    def post_transform_process(self, working_dir, configuration_dir, SETUP, rebuild_driver):
 
         # rename to be sure that file name case matches what is expected
-        transformed_file_name = matches[0]
-        os.rename(os.path.join(configuration_dir, transformed_file_name), os.path.join(configuration_dir, self.name_original_file))
+        os.rename(self.get_transformed_file_path(configuration_dir), os.path.join(configuration_dir, self.name_original_file))
 
         unslice(os.path.join(configuration_dir, self.name_original_file), "prose_workspace/original_files/{}.orig".format(self.name_original_file), SETUP)
 
         # move transformed file to its original location
-        shutil.copy(
-            os.path.join(configuration_dir, self.name_original_file),
-            os.path.join(working_dir, self.path_original_file)
-        )
+        rebuild_driver.install(os.path.join(configuration_dir, self.name_original_file), self.path_original_file)
 
     def reset(self):
-        shutil.copy("prose_workspace/original_files/{}.orig".format(self.name_original_file), self.path_original_file)
\ No newline at end of file
+        write_if_changed("prose_workspace/original_files/{}.orig".format(self.name_original_file), self.path_original_file)
\ No newline at end of file